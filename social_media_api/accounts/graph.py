@@ -0,0 +1,127 @@
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+User = get_user_model()
+
+# Auto-created through table of User.followers: from_user is followed by to_user
+Follow = User.followers.through
+
+FOLLOWING = 'following'
+FOLLOWERS = 'followers'
+
+
+def _cache():
+    return caches[getattr(settings, 'FOLLOW_GRAPH_CACHE', 'default')]
+
+
+def _key(kind, user_id):
+    return f'follow-graph:{kind}:{user_id}'
+
+
+def _load(kind, user_id):
+    if kind == FOLLOWING:
+        edges = Follow.objects.filter(to_user_id=user_id).values_list('from_user_id', flat=True)
+    else:
+        edges = Follow.objects.filter(from_user_id=user_id).values_list('to_user_id', flat=True)
+    return set(edges)
+
+
+def _ids(kind, user_id):
+    cache = _cache()
+    ids = cache.get(_key(kind, user_id))
+    if ids is None:
+        ids = _load(kind, user_id)
+        cache.set(_key(kind, user_id), ids, getattr(settings, 'FOLLOW_GRAPH_CACHE_TIMEOUT', 3600))
+    return ids
+
+
+def following_ids(user_id):
+    """Ids of the users `user_id` follows."""
+    return _ids(FOLLOWING, user_id)
+
+
+def follower_ids(user_id):
+    """Ids of the users following `user_id`."""
+    return _ids(FOLLOWERS, user_id)
+
+
+def is_following(user_id, target_id):
+    return target_id in following_ids(user_id)
+
+
+def _update(kind, user_id, other_id, add):
+    # Only sets that are already cached are patched; missing ones load fresh on the next read
+    cache = _cache()
+    key = _key(kind, user_id)
+    ids = cache.get(key)
+    if ids is None:
+        return
+    if add:
+        ids.add(other_id)
+    else:
+        ids.discard(other_id)
+    cache.set(key, ids, getattr(settings, 'FOLLOW_GRAPH_CACHE_TIMEOUT', 3600))
+
+
+def record_edges(pairs, add):
+    """Apply (follower id, followed id) edge changes to the cached sets of both ends."""
+    for follower_id, followed_id in pairs:
+        _update(FOLLOWING, follower_id, followed_id, add)
+        _update(FOLLOWERS, followed_id, follower_id, add)
+
+
+def adjust_counts(pairs, delta):
+    """Add `delta` per (follower id, followed id) edge to following_count and followers_count."""
+    for field, ids in (('following_count', [f for f, _ in pairs]), ('followers_count', [t for _, t in pairs])):
+        by_amount = defaultdict(list)
+        for user_id, edges in Counter(ids).items():
+            by_amount[edges * delta].append(user_id)
+        for amount, user_ids in by_amount.items():
+            User.objects.filter(pk__in=user_ids).update(**{field: F(field) + amount})
+
+
+def follow_sets_changed(user_ids):
+    from .suggestions import mark_stale
+
+    mark_stale(user_ids)
+
+
+def forget(user_ids):
+    _cache().delete_many([_key(kind, user_id) for user_id in user_ids for kind in (FOLLOWING, FOLLOWERS)])
+
+
+def follow(user, target):
+    """
+    Make `user` follow `target`. Returns False if the edge already existed.
+
+    The unique constraint decides, not the cached sets, which may be stale in other processes.
+    """
+    try:
+        with transaction.atomic():
+            Follow.objects.create(from_user_id=target.id, to_user_id=user.id)
+            User.objects.filter(pk=user.pk).update(following_count=F('following_count') + 1)
+            User.objects.filter(pk=target.pk).update(followers_count=F('followers_count') + 1)
+            follow_sets_changed([user.id])
+    except IntegrityError:
+        created = False
+    else:
+        created = True
+    record_edges([(user.id, target.id)], add=True)
+    return created
+
+
+def unfollow(user, target):
+    """Make `user` stop following `target`. Returns False if there was nothing to remove."""
+    with transaction.atomic():
+        deleted, _ = Follow.objects.filter(from_user_id=target.id, to_user_id=user.id).delete()
+        if deleted:
+            User.objects.filter(pk=user.pk).update(following_count=F('following_count') - 1)
+            User.objects.filter(pk=target.pk).update(followers_count=F('followers_count') - 1)
+            follow_sets_changed([user.id])
+    record_edges([(user.id, target.id)], add=False)
+    return bool(deleted)
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from accounts.graph import Follow, User
+
+
+def count_of(field):
+    # Follow rows read "from_user is followed by to_user"
+    counts = (Follow.objects.filter(**{field: OuterRef('pk')}).order_by()
+              .values(field).annotate(total=Count('pk')).values('total'))
+    return Coalesce(Subquery(counts), Value(0))
+
+
+class Command(BaseCommand):
+    help = 'Repair drift between the stored follower/following counters and the follow table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Number of users checked per transaction.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        repaired = 0
+        last_id = 0
+        while True:
+            ids = list(User.objects.filter(id__gt=last_id).order_by('id')
+                       .values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            last_id = ids[-1]
+
+            with transaction.atomic():
+                drifted = (User.objects.filter(id__in=ids)
+                           .annotate(real_followers=count_of('from_user'), real_following=count_of('to_user'))
+                           .filter(~Q(followers_count=F('real_followers')) | ~Q(following_count=F('real_following')))
+                           .values_list('id', flat=True))
+                drifted = list(drifted)
+                if drifted:
+                    repaired += User.objects.filter(id__in=drifted).update(
+                        followers_count=count_of('from_user'), following_count=count_of('to_user'))
+
+        self.stdout.write(self.style.SUCCESS(f'Repaired counters on {repaired} user(s).'))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from accounts.suggestions import refresh_stale_suggestions, refresh_suggestions
+
+
+class Command(BaseCommand):
+    help = 'Recompute "people you may know" lists: only users whose follows changed, or everyone with --all.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Recompute the lists of every user.')
+        parser.add_argument('--workers', type=int, default=None, help='Worker processes for the traversal.')
+        parser.add_argument('--chunk-size', type=int, default=None, help='Users per worker task.')
+
+    def handle(self, *args, **options):
+        if options['all']:
+            refreshed = refresh_suggestions(workers=options['workers'], chunk_size=options['chunk_size'])
+        else:
+            refreshed = refresh_stale_suggestions(workers=options['workers'], chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Refreshed suggestions for {refreshed} user(s).'))
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.4 on 2026-10-18 18:02
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    User = apps.get_model('accounts', 'User')
+    Follow = User.followers.through
+
+    def count_of(column):
+        counts = (Follow.objects.filter(**{column: OuterRef('pk')}).order_by()
+                  .values(column).annotate(total=Count('pk')).values('total'))
+        return Coalesce(Subquery(counts), Value(0))
+
+    User.objects.update(followers_count=count_of('from_user'), following_count=count_of('to_user'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
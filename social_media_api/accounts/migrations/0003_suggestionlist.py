@@ -0,0 +1,25 @@
+# Generated by Django 5.2.4 on 2026-10-18 18:15
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_user_follow_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SuggestionList',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='suggestion_list', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('users', models.JSONField(default=list)),
+                ('computed_at', models.DateTimeField(blank=True, null=True)),
+                ('stale', models.BooleanField(db_index=True, default=True)),
+                ('marked_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
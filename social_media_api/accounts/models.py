@@ -5,6 +5,19 @@ class User(AbstractUser):
     bio = models.TextField(max_length=500, blank=True)
     profile_picture = models.ImageField(upload_to='profiles/', blank=True, null=True)
     followers = models.ManyToManyField('self', symmetrical=False, related_name='following', blank=True)
+    # Denormalized sizes of the follow graph, maintained by accounts.graph
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
 
     def __str__(self):
-        return self.username
\ No newline at end of file
+        return self.username
+
+class SuggestionList(models.Model):
+    """Precomputed "people you may know" for one user, maintained by accounts.suggestions."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='suggestion_list')
+    # [{"id": ..., "username": ..., "mutual": <followed users who follow them>}, ...], best first
+    users = models.JSONField(default=list)
+    computed_at = models.DateTimeField(null=True, blank=True)
+    # Set when the user's follow set changes; the next incremental refresh recomputes the list
+    stale = models.BooleanField(default=True, db_index=True)
+    marked_at = models.DateTimeField(null=True, blank=True)
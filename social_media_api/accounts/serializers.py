@@ -1,13 +1,21 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from rest_framework.authtoken.models import Token
+from social_media_api.dynamic_fields import DynamicFieldsMixin
+from social_media_api.eager_loading import EagerLoadingMixin
 
 User = get_user_model()
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(DynamicFieldsMixin, EagerLoadingMixin, serializers.ModelSerializer):
     class Meta:
         model = User
-        fields = ['id', 'username', 'email', 'bio', 'profile_picture', 'followers']
+        fields = ['id', 'username', 'email', 'bio', 'profile_picture', 'followers_count', 'following_count']
+        read_only_fields = ['followers_count', 'following_count']
+
+def profile_version(user):
+    # Everything UserSerializer renders; used for conditional GETs
+    return (user.pk, user.username, user.email, user.bio, user.profile_picture.name,
+            user.followers_count, user.following_count)
 
 class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
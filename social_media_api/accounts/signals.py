@@ -0,0 +1,71 @@
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+from social_media_api.authentication import token_cache
+from .graph import Follow, User, adjust_counts, follow_sets_changed, forget, record_edges
+
+
+def _pairs(instance, reverse, pks):
+    if reverse:
+        return [(instance.pk, pk) for pk in pks]   # instance.following changed
+    return [(pk, instance.pk) for pk in pks]       # instance.followers changed
+
+
+def _linked(instance, reverse, pks=None):
+    # Ids at the other end of instance's existing edges, locked until the change commits
+    if reverse:
+        edges, other = Follow.objects.filter(to_user=instance), 'from_user_id'
+    else:
+        edges, other = Follow.objects.filter(from_user=instance), 'to_user_id'
+    if pks is not None:
+        edges = edges.filter(**{f'{other}__in': pks})
+    return list(edges.select_for_update().values_list(other, flat=True))
+
+
+@receiver(m2m_changed, sender=Follow)
+def sync_follow_graph(sender, instance, action, reverse, pk_set, **kwargs):
+    # Keeps the counters and the cache right when edges are changed through user.followers /
+    # user.following. Django sends these inside the transaction that changes the rows.
+    if action == 'post_add':
+        # pk_set holds only the edges that were missing
+        adjust_counts(_pairs(instance, reverse, pk_set), 1)
+    elif action == 'pre_remove':
+        # pk_set holds whatever was asked for; only existing edges are deleted
+        adjust_counts(_pairs(instance, reverse, _linked(instance, reverse, pk_set)), -1)
+    if action in ('post_add', 'post_remove'):
+        pairs = _pairs(instance, reverse, pk_set)
+        record_edges(pairs, add=action == 'post_add')
+        follow_sets_changed([follower_id for follower_id, _ in pairs])
+    elif action == 'pre_clear':
+        linked = _linked(instance, reverse)
+        own, theirs = ('following_count', 'followers_count') if reverse else ('followers_count', 'following_count')
+        User.objects.filter(pk=instance.pk).update(**{own: 0})
+        User.objects.filter(pk__in=linked).update(**{theirs: F(theirs) - 1})
+        affected = [instance.pk, *linked]
+        forget(affected)
+        follow_sets_changed(affected)
+
+
+@receiver(pre_delete, sender=User)
+def forget_deleted_user(sender, instance, **kwargs):
+    # The cascade deletes the edges without m2m signals; the neighbours' counters drop here
+    followers = list(Follow.objects.filter(from_user=instance).values_list('to_user_id', flat=True))
+    followed = list(Follow.objects.filter(to_user=instance).values_list('from_user_id', flat=True))
+    User.objects.filter(pk__in=followers).update(following_count=F('following_count') - 1)
+    User.objects.filter(pk__in=followed).update(followers_count=F('followers_count') - 1)
+    forget([instance.pk, *followers, *followed])
+
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def revoke_cached_token(sender, instance, **kwargs):
+    # Logout and token rotation delete the old key
+    token_cache.invalidate([instance.key])
+
+
+@receiver(post_save, sender=User)
+def refresh_cached_user(sender, instance, created, **kwargs):
+    # Deactivation (and any other change) must not be served from a cached copy of the user
+    if not created:
+        token_cache.invalidate_user(instance.pk)
@@ -0,0 +1,121 @@
+import heapq
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from .graph import Follow
+from .models import SuggestionList, User
+
+# Set in each worker process by _init_worker, so the graph is pickled once per process
+_graph = None
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _upsert(rows, update_fields):
+    # MySQL's ON DUPLICATE KEY UPDATE takes no conflict target; the other backends require one
+    target = {'unique_fields': ['user']} if connection.features.supports_update_conflicts_with_target else {}
+    SuggestionList.objects.bulk_create(rows, update_conflicts=True, update_fields=update_fields, **target)
+
+
+def mark_stale(user_ids):
+    """Queue the suggestions of users whose follow set changed for the next incremental refresh."""
+    now = timezone.now()
+    _upsert([SuggestionList(user_id=user_id, stale=True, marked_at=now) for user_id in set(user_ids)],
+            ['stale', 'marked_at'])
+
+
+def load_following(user_ids=None):
+    """{user id: set of followed ids} for `user_ids`, or for the whole graph."""
+    edges = Follow.objects.values_list('to_user_id', 'from_user_id')
+    graph = {}
+    if user_ids is None:
+        chunks = [edges]
+    else:
+        user_ids = list(user_ids)
+        size = _setting('SUGGESTIONS_CHUNK_SIZE', 1000)
+        chunks = [edges.filter(to_user_id__in=user_ids[i:i + size]) for i in range(0, len(user_ids), size)]
+    for chunk in chunks:
+        for follower_id, followed_id in chunk.iterator(chunk_size=10000):
+            graph.setdefault(follower_id, set()).add(followed_id)
+    return graph
+
+
+def suggest(user_id, graph, limit):
+    """Top `limit` (id, mutual) pairs two hops away from `user_id` that it does not follow yet."""
+    following = graph.get(user_id, set())
+    mutual = Counter()
+    for followed_id in following:
+        mutual.update(graph.get(followed_id, ()))
+    for known in following | {user_id}:
+        mutual.pop(known, None)
+    return heapq.nsmallest(limit, mutual.items(), key=lambda item: (-item[1], item[0]))
+
+
+def _init_worker(graph):
+    global _graph
+    _graph = graph
+
+
+def _suggest_chunk(user_ids, limit):
+    return {user_id: suggest(user_id, _graph, limit) for user_id in user_ids}
+
+
+def _save(results, started_at):
+    usernames = dict(User.objects.filter(id__in={pk for pairs in results.values() for pk, _ in pairs})
+                     .values_list('id', 'username'))
+    _upsert([SuggestionList(user_id=user_id, stale=False, computed_at=started_at,
+                            users=[{'id': pk, 'username': usernames[pk], 'mutual': count}
+                                   for pk, count in pairs if pk in usernames])
+             for user_id, pairs in results.items()],
+            ['users', 'computed_at', 'stale'])
+    # Follows that happened while this chunk was computed keep it queued
+    SuggestionList.objects.filter(user_id__in=results, marked_at__gt=started_at).update(stale=True)
+
+
+def refresh_suggestions(user_ids=None, workers=None, chunk_size=None):
+    """
+    Recompute the suggestion lists of `user_ids` (all users with follows when None).
+
+    The follow graph is read once, split into chunks of users, and the second-degree
+    traversal of each chunk runs in a process pool; results are written per chunk.
+    Returns the number of lists written.
+    """
+    started_at = timezone.now()
+    limit = _setting('SUGGESTIONS_SIZE', 20)
+    chunk_size = chunk_size or _setting('SUGGESTIONS_CHUNK_SIZE', 1000)
+    workers = workers or _setting('SUGGESTIONS_WORKERS', None) or os.cpu_count()
+
+    if user_ids is None:
+        graph = load_following()
+        user_ids = list(graph)
+    else:
+        user_ids = list(user_ids)
+        graph = load_following(user_ids)
+        graph.update(load_following({pk for followed in graph.values() for pk in followed} - graph.keys()))
+
+    chunks = [user_ids[i:i + chunk_size] for i in range(0, len(user_ids), chunk_size)]
+    if workers <= 1 or len(chunks) <= 1:
+        _init_worker(graph)
+        for chunk in chunks:
+            _save(_suggest_chunk(chunk, limit), started_at)
+        return len(user_ids)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(graph,)) as pool:
+        for result in pool.map(_suggest_chunk, chunks, [limit] * len(chunks)):
+            _save(result, started_at)
+    return len(user_ids)
+
+
+def refresh_stale_suggestions(workers=None, chunk_size=None):
+    """Incremental run: recompute only the lists queued by mark_stale."""
+    stale = list(SuggestionList.objects.filter(stale=True).values_list('user_id', flat=True))
+    if not stale:
+        return 0
+    return refresh_suggestions(stale, workers=workers, chunk_size=chunk_size)
@@ -1,3 +1,317 @@
-from django.test import TestCase
+from io import StringIO
+from unittest import mock
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+from social_media_api.authentication import TokenCache, token_cache
+from social_media_api.throttling import LocalBuckets, local_buckets
+from .graph import Follow, follower_ids, following_ids, is_following, record_edges
+from .models import SuggestionList
+from .suggestions import mark_stale
 
-# Create your tests here.
+User = get_user_model()
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class FollowGraphTests(APITestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice')
+        self.bob = User.objects.create_user(username='bob')
+        self.client.force_authenticate(self.alice)
+        cache.clear()
+
+    def test_follow_and_unfollow_maintain_counters(self):
+        self.client.post(reverse('follow_user', args=[self.bob.id]))
+        # Following twice must not count twice
+        self.client.post(reverse('follow_user', args=[self.bob.id]))
+        self.alice.refresh_from_db()
+        self.bob.refresh_from_db()
+        self.assertEqual((self.alice.following_count, self.bob.followers_count), (1, 1))
+
+        response = self.client.post(reverse('unfollow_user', args=[self.bob.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.post(reverse('unfollow_user', args=[self.bob.id]))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.bob.refresh_from_db()
+        self.assertEqual(self.bob.followers_count, 0)
+
+    def test_profile_renders_counts_instead_of_follower_ids(self):
+        response = self.client.get(reverse('profile'))
+        self.assertNotIn('followers', response.data)
+        self.assertEqual(response.data['following_count'], 0)
+
+    def test_writes_do_not_trust_a_stale_cache(self):
+        # Another worker changed the edge; this process still has the old set cached
+        following_ids(self.alice.id)
+        Follow.objects.create(from_user=self.bob, to_user=self.alice)
+        User.objects.filter(pk=self.alice.pk).update(following_count=1)
+        User.objects.filter(pk=self.bob.pk).update(followers_count=1)
+        response = self.client.post(reverse('unfollow_user', args=[self.bob.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(Follow.objects.exists())
+
+        following_ids(self.alice.id)
+        record_edges([(self.alice.id, self.bob.id)], add=True)
+        self.client.post(reverse('follow_user', args=[self.bob.id]))
+        self.assertTrue(Follow.objects.filter(from_user=self.bob, to_user=self.alice).exists())
+
+    def test_profile_supports_conditional_get(self):
+        etag = self.client.get(reverse('profile'))['ETag']
+        response = self.client.get(reverse('profile'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.client.post(reverse('follow_user', args=[self.bob.id]))
+        response = self.client.get(reverse('profile'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['following_count'], 1)
+
+    def test_followers_and_following_lists_are_keyset_paginated(self):
+        fans = [User.objects.create_user(username=f'fan{i}') for i in range(3)]
+        for fan in fans:
+            fan.following.add(self.bob)
+
+        response = self.client.get(reverse('user_followers', args=[self.bob.id]), {'page_size': 2})
+        ids = [user['id'] for user in response.data['results']]
+        response = self.client.get(response.data['next'])
+        ids += [user['id'] for user in response.data['results']]
+        self.assertEqual(ids, sorted((fan.id for fan in fans), reverse=True))
+
+        response = self.client.get(reverse('user_followers', args=[self.bob.id]), {'fields': 'username'})
+        self.assertEqual(response.data['results'], [{'username': 'fan2'}, {'username': 'fan1'}, {'username': 'fan0'}])
+
+        response = self.client.get(reverse('user_following', args=[fans[0].id]))
+        self.assertEqual([user['id'] for user in response.data['results']], [self.bob.id])
+
+    def test_membership_checks_are_served_from_the_graph_cache(self):
+        self.client.post(reverse('follow_user', args=[self.bob.id]))
+        self.assertEqual(following_ids(self.alice.id), {self.bob.id})
+        self.assertEqual(follower_ids(self.bob.id), {self.alice.id})
+        with self.assertNumQueries(0):
+            self.assertTrue(is_following(self.alice.id, self.bob.id))
+            self.assertEqual(follower_ids(self.bob.id), {self.alice.id})
+
+        # Repeated follows and unfollows of a missing edge leave the graph as it is
+        response = self.client.post(reverse('follow_user', args=[self.bob.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.client.post(reverse('unfollow_user', args=[self.bob.id]))
+        self.assertEqual(follower_ids(self.bob.id), set())
+        response = self.client.post(reverse('unfollow_user', args=[self.bob.id]))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_direct_m2m_changes_update_the_cache(self):
+        self.assertFalse(is_following(self.alice.id, self.bob.id))
+        self.alice.following.add(self.bob)
+        self.assertTrue(is_following(self.alice.id, self.bob.id))
+        self.bob.followers.remove(self.alice)
+        self.assertFalse(is_following(self.alice.id, self.bob.id))
+
+        self.bob.followers.add(self.alice)
+        follower_ids(self.bob.id)
+        self.bob.followers.clear()
+        self.assertEqual(following_ids(self.alice.id), set())
+        self.assertEqual(follower_ids(self.bob.id), set())
+
+    def counts(self, user):
+        user.refresh_from_db()
+        return user.followers_count, user.following_count
+
+    def test_direct_m2m_changes_update_the_counters(self):
+        carol = User.objects.create_user(username='carol')
+        self.alice.following.add(self.bob, carol)
+        self.alice.following.add(self.bob)  # already there
+        carol.following.add(self.bob)
+        self.assertEqual([self.counts(u) for u in (self.alice, self.bob, carol)], [(0, 2), (2, 0), (1, 1)])
+
+        self.bob.followers.remove(self.alice, self.bob)  # bob never followed himself
+        self.assertEqual([self.counts(u) for u in (self.alice, self.bob, carol)], [(0, 1), (1, 0), (1, 1)])
+
+        self.alice.following.add(self.bob)
+        self.bob.followers.clear()
+        self.assertEqual([self.counts(u) for u in (self.alice, self.bob, carol)], [(0, 1), (0, 0), (1, 0)])
+
+        carol.delete()
+        self.assertEqual(self.counts(self.alice), (0, 0))
+
+    def test_reconcile_follow_counts(self):
+        self.alice.following.add(self.bob)
+        User.objects.filter(pk=self.alice.pk).update(following_count=7, followers_count=3)
+        out = StringIO()
+        call_command('reconcile_follow_counts', '--batch-size', '1', stdout=out)
+        self.assertIn('Repaired counters on 1 user(s).', out.getvalue())
+        self.assertEqual([self.counts(u) for u in (self.alice, self.bob)], [(0, 1), (1, 0)])
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class SuggestionTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice, self.bob, self.carol, self.dave, self.erin = [
+            User.objects.create_user(username=name) for name in ('alice', 'bob', 'carol', 'dave', 'erin')]
+        self.alice.following.add(self.bob, self.carol)
+        self.bob.following.add(self.dave, self.erin)
+        self.carol.following.add(self.dave)
+        self.client.force_authenticate(self.alice)
+
+    def suggested(self):
+        following_ids(self.alice.id)  # warm the follow graph cache
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('user_suggestions'))
+        return [(user['username'], user['mutual']) for user in response.data['results']]
+
+    def test_friends_of_friends_ranked_by_mutual_follows(self):
+        call_command('refresh_suggestions', '--all', '--workers', '2', '--chunk-size', '1', stdout=StringIO())
+        self.assertEqual(self.suggested(), [('dave', 2), ('erin', 1)])
+        self.assertFalse(SuggestionList.objects.filter(stale=True).exists())
+
+    def test_incremental_refresh_only_recomputes_changed_users(self):
+        call_command('refresh_suggestions', '--all', '--workers', '1', stdout=StringIO())
+        self.client.post(reverse('follow_user', args=[self.dave.id]))
+        # Served list hides the new follow right away, before any refresh
+        self.assertEqual(self.suggested(), [('erin', 1)])
+        self.assertEqual(list(SuggestionList.objects.filter(stale=True).values_list('user', flat=True)),
+                         [self.alice.id])
+
+        out = StringIO()
+        call_command('refresh_suggestions', '--workers', '1', stdout=out)
+        self.assertIn('1 user(s)', out.getvalue())
+        self.assertEqual(self.suggested(), [('erin', 1)])
+
+    def test_upsert_omits_conflict_target_where_unsupported(self):
+        # MySQL rejects unique_fields in bulk_create(update_conflicts=True)
+        with mock.patch.object(connection.features, 'supports_update_conflicts_with_target', False), \
+                mock.patch.object(SuggestionList.objects, 'bulk_create') as bulk_create:
+            mark_stale([self.alice.id])
+        self.assertNotIn('unique_fields', bulk_create.call_args.kwargs)
+        self.assertTrue(bulk_create.call_args.kwargs['update_conflicts'])
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class CachedTokenAuthenticationTests(APITestCase):
+    def setUp(self):
+        token_cache.clear()
+        self.user = User.objects.create_user(username='alice')
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_repeated_requests_skip_the_token_query(self):
+        hits = token_cache.stats()['hits']
+        self.assertEqual(self.client.get(reverse('user_suggestions')).status_code, status.HTTP_200_OK)
+        # only the suggestion list is read; no Token/User join
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(reverse('user_suggestions')).status_code, status.HTTP_200_OK)
+        self.assertEqual(token_cache.stats()['hits'], hits + 1)
+
+    def test_logout_revokes_the_cached_token(self):
+        self.client.get(reverse('user_suggestions'))
+        self.assertEqual(self.client.post(reverse('logout')).status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.client.get(reverse('user_suggestions')).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_token_rotation_and_deactivation_are_seen_immediately(self):
+        self.client.get(reverse('user_suggestions'))
+        self.token.delete()
+        rotated = Token.objects.create(user=self.user)
+        self.assertEqual(self.client.get(reverse('user_suggestions')).status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {rotated.key}')
+        self.assertEqual(self.client.get(reverse('user_suggestions')).status_code, status.HTTP_200_OK)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(reverse('user_suggestions')).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(TOKEN_AUTH_SHARED_CACHE='default')
+    def test_shared_tier_serves_other_processes(self):
+        cache.clear()
+        self.client.get(reverse('user_suggestions'))
+        token_cache.clear()  # as if this were a fresh process
+        shared_hits = token_cache.stats()['shared_hits']
+        self.assertEqual(self.client.get(reverse('user_suggestions')).status_code, status.HTTP_200_OK)
+        self.assertEqual(token_cache.stats()['shared_hits'], shared_hits + 1)
+
+    @override_settings(TOKEN_AUTH_SHARED_CACHE='default')
+    def test_revocation_reaches_other_processes(self):
+        cache.clear()
+        self.client.get(reverse('user_suggestions'))
+        other = TokenCache()  # another worker, with the token in its own first tier
+        self.assertIsNotNone(other.get(self.token.key))
+        self.assertIsNotNone(other.get(self.token.key))
+
+        self.client.post(reverse('logout'))
+        self.assertIsNone(other.get(self.token.key))
+
+        rotated = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {rotated.key}')
+        self.client.get(reverse('user_suggestions'))
+        other.get(rotated.key)
+        self.user.bio = 'edited'
+        self.user.save()  # drops cached copies of the user; the token stays valid
+        self.assertIsNone(other.get(rotated.key))
+        self.assertEqual(self.client.get(reverse('user_suggestions')).status_code, status.HTTP_200_OK)
+        user, _ = other.get(rotated.key)
+        self.assertEqual(user.bio, 'edited')
+
+
+def throttle_rates(**rates):
+    return override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': rates})
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class ThrottleTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        local_buckets.clear()
+        self.alice = User.objects.create_user(username='alice', password='pass12345')
+        self.bob = User.objects.create_user(username='bob', password='pass12345')
+
+    def login(self):
+        return self.client.post(reverse('login'), {'username': 'alice', 'password': 'wrong'}, format='json')
+
+    @throttle_rates(login='2/min')
+    def test_login_is_throttled_per_ip_before_hashing(self):
+        with mock.patch('accounts.views.authenticate', return_value=None) as authenticate:
+            self.assertEqual(self.login().status_code, status.HTTP_401_UNAUTHORIZED)
+            self.assertEqual(self.login().status_code, status.HTTP_401_UNAUTHORIZED)
+            response = self.login()
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response['Retry-After'], '30')
+        self.assertEqual(authenticate.call_count, 2)
+
+    @throttle_rates(login='2/min')
+    def test_forged_forwarded_for_does_not_reset_the_login_bucket(self):
+        with mock.patch('accounts.views.authenticate', return_value=None):
+            statuses = [self.client.post(reverse('login'), {'username': 'alice', 'password': 'wrong'}, format='json',
+                                         HTTP_X_FORWARDED_FOR=f'10.0.0.{i}, 203.0.113.7').status_code
+                        for i in range(3)]
+        self.assertEqual(statuses, [401, 401, 429])
+
+    @throttle_rates(follow='1/min')
+    def test_follow_is_throttled_per_user(self):
+        carol = User.objects.create_user(username='carol')
+        self.client.force_authenticate(self.alice)
+        self.assertEqual(self.client.post(reverse('follow_user', args=[self.bob.id])).status_code, 200)
+        self.assertEqual(self.client.post(reverse('unfollow_user', args=[self.bob.id])).status_code, 429)
+        self.client.force_authenticate(carol)
+        self.assertEqual(self.client.post(reverse('follow_user', args=[self.bob.id])).status_code, 200)
+
+    @throttle_rates(login='1/min')
+    @override_settings(THROTTLE_CACHE='default')
+    def test_shared_cache_buckets(self):
+        self.assertEqual(self.login().status_code, status.HTTP_401_UNAUTHORIZED)
+        local_buckets.clear()  # the shared cache alone must remember the request
+        self.assertEqual(self.login().status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_bucket_refills_over_time(self):
+        buckets = LocalBuckets()
+        with mock.patch('social_media_api.throttling.time.monotonic', return_value=100.0) as clock:
+            self.assertEqual(buckets.take('k', 2, 1.0), 0)
+            self.assertEqual(buckets.take('k', 2, 1.0), 0)
+            self.assertAlmostEqual(buckets.take('k', 2, 1.0), 0.5)
+            clock.return_value = 100.5
+            self.assertEqual(buckets.take('k', 2, 1.0), 0)
+            self.assertGreater(buckets.take('k', 2, 1.0), 0)
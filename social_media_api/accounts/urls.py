@@ -1,10 +1,16 @@
 from django.urls import path
-from .views import RegisterView, LoginView, ProfileView, follow_user, unfollow_user
+from .views import (RegisterView, LoginView, LogoutView, ProfileView, follow_user, unfollow_user,
+                    FollowersListView, FollowingListView, suggestions, auth_cache_stats)
 
 urlpatterns = [
     path('register/', RegisterView.as_view(), name='register'),
     path('login/', LoginView.as_view(), name='login'),
+    path('logout/', LogoutView.as_view(), name='logout'),
     path('profile/', ProfileView.as_view(), name='profile'),
     path('follow/<int:user_id>/', follow_user, name='follow_user'),
     path('unfollow/<int:user_id>/', unfollow_user, name='unfollow_user'),
+    path('auth-cache/', auth_cache_stats, name='auth_cache_stats'),
+    path('suggestions/', suggestions, name='user_suggestions'),
+    path('<int:user_id>/followers/', FollowersListView.as_view(), name='user_followers'),
+    path('<int:user_id>/following/', FollowingListView.as_view(), name='user_following'),
 ]
\ No newline at end of file
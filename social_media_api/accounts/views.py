@@ -2,10 +2,18 @@ from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework.authtoken.models import Token
 from django.contrib.auth import authenticate
-from rest_framework.permissions import AllowAny, IsAuthenticated
-from .serializers import RegisterSerializer, LoginSerializer, UserSerializer
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
+from .serializers import RegisterSerializer, LoginSerializer, UserSerializer, profile_version
 from django.contrib.auth import get_user_model
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
+from social_media_api.authentication import token_cache
+from social_media_api.conditional import conditional_response, make_etag
+from social_media_api.eager_loading import EagerLoadingViewMixin
+from social_media_api.pagination import KeysetPagination
+from social_media_api.throttling import BucketThrottle
+from .graph import follow, following_ids, unfollow
+from .models import SuggestionList
+from posts.timeline import backfill_timeline, trim_timeline
 
 User = get_user_model()
 
@@ -28,6 +36,9 @@ class RegisterView(generics.CreateAPIView):
 class LoginView(generics.GenericAPIView):
     serializer_class = LoginSerializer
     permission_classes = [AllowAny]
+    # Refused before the password is hashed
+    throttle_classes = [BucketThrottle]
+    throttle_scope = 'login'
 
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -44,15 +55,31 @@ class LoginView(generics.GenericAPIView):
             }, status=status.HTTP_200_OK)
         return Response({'error': 'Invalid credentials'}, status=status.HTTP_401_UNAUTHORIZED)
 
-class ProfileView(generics.RetrieveUpdateAPIView):
+class LogoutView(generics.GenericAPIView):
+    def post(self, request, *args, **kwargs):
+        # Deleting the token also drops it from the authentication cache
+        Token.objects.filter(user=request.user).delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+class ProfileView(EagerLoadingViewMixin, generics.RetrieveUpdateAPIView):
     queryset = User.objects.all()
     serializer_class = UserSerializer
 
     def get_object(self):
-        return self.request.user
+        # request.user may come from the token cache, whose follow counters can lag
+        return User.objects.get(pk=self.request.user.pk)
+
+    def retrieve(self, request, *args, **kwargs):
+        user = self.get_object()
+        return conditional_response(request, make_etag(request, *profile_version(user)),
+                                    lambda: Response(self.get_serializer(user).data))
     
+class FollowThrottle(BucketThrottle):
+    scope = 'follow'
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@throttle_classes([FollowThrottle])
 def follow_user(request, user_id):
     try:
         user_to_follow = User.objects.get(id=user_id)
@@ -63,19 +90,57 @@ def follow_user(request, user_id):
     if request.user == user_to_follow:
         return Response({'error': 'You cannot follow yourself'}, status=status.HTTP_400_BAD_REQUEST)
         
-    request.user.following.add(user_to_follow)
+    if follow(request.user, user_to_follow):
+        backfill_timeline(request.user, user_to_follow)
     return Response({'status': f'You are now following {user_to_follow.username}'}, status=status.HTTP_200_OK)
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@throttle_classes([FollowThrottle])
 def unfollow_user(request, user_id):
     try:
         user_to_unfollow = User.objects.get(id=user_id)
     except User.DoesNotExist:
         return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
 
-    if request.user.following.filter(id=user_to_unfollow.id).exists():
-        request.user.following.remove(user_to_unfollow)
+    if unfollow(request.user, user_to_unfollow):
+        trim_timeline(request.user, user_to_unfollow)
         return Response({'status': f'You have unfollowed {user_to_unfollow.username}'}, status=status.HTTP_200_OK)
     
-    return Response({'error': 'You are not following this user'}, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+    return Response({'error': 'You are not following this user'}, status=status.HTTP_400_BAD_REQUEST)
+
+class FollowersListView(EagerLoadingViewMixin, generics.ListAPIView):
+    serializer_class = UserSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    cursor_ordering = ('-id',)
+
+    def get_queryset(self):
+        return User.objects.filter(following=self.kwargs['user_id'])
+
+
+class FollowingListView(EagerLoadingViewMixin, generics.ListAPIView):
+    serializer_class = UserSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    cursor_ordering = ('-id',)
+
+    def get_queryset(self):
+        return User.objects.filter(followers=self.kwargs['user_id'])
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def suggestions(request):
+    """People you may know, precomputed by the refresh_suggestions command."""
+    users = SuggestionList.objects.filter(user=request.user).values_list('users', flat=True).first() or []
+    # Drop anyone followed since the list was computed; the follow graph cache answers this
+    following = following_ids(request.user.id)
+    return Response({'results': [user for user in users if user['id'] not in following]})
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def auth_cache_stats(request):
+    """Hit/miss counters of this process's token cache, for sizing TOKEN_AUTH_CACHE_SIZE."""
+    return Response(token_cache.stats())
@@ -0,0 +1,52 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from .models import Notification, UnreadCounter
+
+
+def increment_unread(deltas):
+    """Add `deltas` ({user_id: n}) to the stored unread counters, creating missing rows."""
+    for user_id, delta in deltas.items():
+        if not delta:
+            continue
+        if UnreadCounter.objects.filter(pk=user_id).update(count=F('count') + delta):
+            continue
+        try:
+            with transaction.atomic():
+                # A missing row is initialised from the table, which already includes this delta
+                UnreadCounter.objects.create(user_id=user_id, count=count_unread(user_id))
+        except IntegrityError:
+            UnreadCounter.objects.filter(pk=user_id).update(count=F('count') + delta)
+
+
+def reset_unread(user_id):
+    UnreadCounter.objects.update_or_create(user_id=user_id, defaults={'count': 0})
+
+
+def count_unread(user_id):
+    return Notification.objects.filter(recipient_id=user_id, is_read=False).count()
+
+
+def get_unread_count(user_id):
+    count = UnreadCounter.objects.filter(pk=user_id).values_list('count', flat=True).first()
+    if count is None:
+        count = reconcile_unread([user_id])[user_id]
+    return count
+
+
+def reconcile_unread(user_ids=None):
+    """Recompute counters from the notifications table. Returns {user_id: count}."""
+    unread = Notification.objects.filter(is_read=False)
+    if user_ids is not None:
+        unread = unread.filter(recipient_id__in=user_ids)
+    counts = dict(unread.order_by().values('recipient_id').annotate(total=Count('id'))
+                  .values_list('recipient_id', 'total'))
+    with transaction.atomic():
+        if user_ids is not None:
+            for user_id in user_ids:
+                counts.setdefault(user_id, 0)
+        else:
+            UnreadCounter.objects.exclude(count=0).update(count=0)
+
+        for user_id, count in counts.items():
+            UnreadCounter.objects.update_or_create(user_id=user_id, defaults={'count': count})
+    return counts
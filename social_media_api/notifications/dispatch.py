@@ -0,0 +1,197 @@
+from collections import Counter
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.db import DatabaseError, IntegrityError, connection, transaction
+from django.utils import timezone
+
+from .models import Notification, NotificationEvent
+from .counters import increment_unread
+from .streaming import get_broker
+
+User = get_user_model()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def build_event(recipient_id, actor, verb, target):
+    return NotificationEvent(
+        recipient_id=recipient_id,
+        actor=actor,
+        verb=verb,
+        content_type=ContentType.objects.get_for_model(target),
+        object_id=target.pk,
+    )
+
+
+def notify(recipient, actor, verb, target):
+    enqueue([build_event(recipient.pk, actor, verb, target)])
+
+
+def enqueue(events):
+    """
+    Hand notification events to the dispatch layer.
+
+    With NOTIFICATIONS_DISPATCH_MODE = 'outbox' the events are written to the outbox in one
+    INSERT and delivered later by the `process_notifications` worker; 'sync' delivers them
+    immediately inside the caller's transaction (used by the tests).
+    """
+    events = [event for event in events if event.recipient_id != event.actor_id]
+    if not events:
+        return
+    if _setting('NOTIFICATIONS_DISPATCH_MODE', 'outbox') == 'sync':
+        deliver(events)
+    else:
+        NotificationEvent.objects.bulk_create(events)
+
+
+def deliver(events):
+    """
+    Turn events into Notification rows.
+
+    Events for the same recipient, verb and target are coalesced into one row per
+    NOTIFICATIONS_COALESCE_WINDOW seconds; a window of 0 writes one row per event.
+    """
+    window = _setting('NOTIFICATIONS_COALESCE_WINDOW', 3600)
+    with transaction.atomic():
+        if not window:
+            notifications = Notification.objects.bulk_create([
+                Notification(recipient_id=event.recipient_id, actor_id=event.actor_id, verb=event.verb,
+                             content_type_id=event.content_type_id, object_id=event.object_id,
+                             sample_actors=[{'id': event.actor_id, 'username': username}])
+                for event, username in zip(events, _usernames(events))
+            ])
+            increment_unread(Counter(notification.recipient_id for notification in notifications))
+            _publish(notifications)
+            return notifications
+
+        groups = {}
+        for event, username in zip(events, _usernames(events)):
+            key = (event.recipient_id, event.verb, event.content_type_id, event.object_id)
+            actors = groups.setdefault(key, {})
+            actors.pop(event.actor_id, None)
+            actors[event.actor_id] = username
+
+        window_start = _window_start(timezone.now(), window)
+        notifications, newly_unread = [], Counter()
+        for key, actors in groups.items():
+            notification, became_unread = _coalesce(key, actors, window_start)
+            notifications.append(notification)
+            if became_unread:
+                newly_unread[notification.recipient_id] += 1
+        increment_unread(newly_unread)
+        _publish(notifications)
+        return notifications
+
+
+def _publish(notifications):
+    # Live SSE connections (notifications.streaming) only hear about committed rows
+    transaction.on_commit(lambda: get_broker().publish(notifications))
+
+
+def _usernames(events):
+    usernames = dict(User.objects.filter(id__in={event.actor_id for event in events})
+                     .values_list('id', 'username'))
+    return [usernames.get(event.actor_id, '') for event in events]
+
+
+def _window_start(now, window):
+    seconds = int(now.timestamp())
+    return datetime.fromtimestamp(seconds - seconds % window, tz=dt_timezone.utc)
+
+
+def _merge_samples(new, old):
+    limit = _setting('NOTIFICATIONS_SAMPLE_ACTORS', 3)
+    merged = {}
+    for actor in new + old:
+        merged.setdefault(actor['id'], actor)
+    return list(merged.values())[:limit]
+
+
+def _coalesce(key, actors, window_start):
+    """
+    Atomic update-or-insert of the aggregate row for one (recipient, verb, target, window).
+    Returns the row and whether it went from read (or absent) to unread.
+    """
+    recipient_id, verb, content_type_id, object_id = key
+    # actors maps actor id -> username, oldest first; the newest actor leads the samples
+    samples = [{'id': actor_id, 'username': username} for actor_id, username in reversed(actors.items())]
+    lookup = dict(recipient_id=recipient_id, verb=verb, content_type_id=content_type_id,
+                  object_id=object_id, window_start=window_start)
+
+    while True:
+        existing = Notification.objects.select_for_update().filter(**lookup).first()
+        if existing is None:
+            try:
+                with transaction.atomic():
+                    notification = Notification.objects.create(actor_id=samples[0]['id'], actor_count=len(samples),
+                                                               sample_actors=_merge_samples(samples, []), **lookup)
+                return notification, True
+            except IntegrityError:
+                # Another worker opened this window first; merge into its row instead
+                continue
+
+        # Actors still listed in the samples are not counted twice
+        known = {actor['id'] for actor in existing.sample_actors}
+        existing.actor_id = samples[0]['id']
+        existing.actor_count += len(actors.keys() - known)
+        existing.sample_actors = _merge_samples(samples, existing.sample_actors)
+        existing.timestamp = timezone.now()
+        became_unread = existing.is_read
+        existing.is_read = False
+        existing.save(update_fields=['actor', 'actor_count', 'sample_actors', 'timestamp', 'is_read'])
+        return existing, became_unread
+
+
+def _claim(batch_size):
+    ready = (NotificationEvent.objects
+             .filter(failed=False, available_at__lte=timezone.now())
+             .order_by('id'))
+    if connection.features.has_select_for_update_skip_locked:
+        # Lets several workers drain the outbox without waiting on each other's rows
+        ready = ready.select_for_update(skip_locked=True)
+    return list(ready[:batch_size])
+
+
+def _schedule_retry(event, error):
+    event.attempts += 1
+    event.last_error = str(error)
+    if event.attempts >= _setting('NOTIFICATIONS_MAX_ATTEMPTS', 5):
+        event.failed = True
+    else:
+        delay = _setting('NOTIFICATIONS_RETRY_DELAY', 30) * 2 ** (event.attempts - 1)
+        event.available_at = timezone.now() + timedelta(seconds=delay)
+
+
+def process_batch(batch_size=None):
+    """Deliver one batch of ready outbox events. Returns the number of events handled."""
+    batch_size = batch_size or _setting('NOTIFICATIONS_BATCH_SIZE', 500)
+    with transaction.atomic():
+        events = _claim(batch_size)
+        if not events:
+            return 0
+
+        try:
+            with transaction.atomic():
+                deliver(events)
+            delivered, retry = events, []
+        except DatabaseError:
+            # Retry one by one so a single bad event does not hold back the rest of the batch
+            delivered, retry = [], []
+            for event in events:
+                try:
+                    with transaction.atomic():
+                        deliver([event])
+                    delivered.append(event)
+                except DatabaseError as exc:
+                    _schedule_retry(event, exc)
+                    retry.append(event)
+
+        NotificationEvent.objects.filter(id__in=[event.id for event in delivered]).delete()
+        if retry:
+            NotificationEvent.objects.bulk_update(retry, ['attempts', 'last_error', 'failed', 'available_at'])
+    return len(events)
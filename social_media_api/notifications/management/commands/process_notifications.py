@@ -0,0 +1,59 @@
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from notifications.dispatch import process_batch
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued notification events from the outbox in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=1, help='Number of worker threads.')
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help='Seconds to sleep when the outbox is empty.')
+        parser.add_argument('--once', action='store_true', help='Exit once the outbox is drained.')
+
+    def handle(self, *args, **options):
+        self.stop = threading.Event()
+        self.processed = 0
+        self.lock = threading.Lock()
+
+        try:
+            if options['concurrency'] <= 1:
+                self.work(options, close_connection=False)
+            else:
+                self.run_threads(options)
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f'Processed {self.processed} notification event(s).'))
+
+    def run_threads(self, options):
+        workers = [threading.Thread(target=self.work, args=(options,), daemon=True)
+                   for _ in range(options['concurrency'])]
+        for worker in workers:
+            worker.start()
+        try:
+            for worker in workers:
+                while worker.is_alive():
+                    worker.join(timeout=0.5)
+        except KeyboardInterrupt:
+            self.stop.set()
+            for worker in workers:
+                worker.join()
+
+    def work(self, options, close_connection=True):
+        try:
+            while not self.stop.is_set():
+                handled = process_batch(options['batch_size'])
+                with self.lock:
+                    self.processed += handled
+                if not handled:
+                    if options['once']:
+                        break
+                    self.stop.wait(options['interval'])
+        finally:
+            # Each worker thread has its own database connection
+            if close_connection:
+                connection.close()
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from notifications.counters import reconcile_unread
+
+
+class Command(BaseCommand):
+    help = 'Recompute the stored unread-notification counters from the notifications table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids',
+                            help='Only reconcile this user id (repeatable).')
+
+    def handle(self, *args, **options):
+        counts = reconcile_unread(options['user_ids'])
+        self.stdout.write(self.style.SUCCESS(f'Reconciled unread counters for {len(counts)} user(s).'))
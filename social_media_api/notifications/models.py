@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth import get_user_model
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
@@ -18,8 +19,54 @@ class Notification(models.Model):
     timestamp = models.DateTimeField(auto_now_add=True)
     is_read = models.BooleanField(default=False)
 
+    # Coalescing: every event for the same recipient, verb and target inside one window is
+    # merged into a single row. `actor` is the latest actor, `sample_actors` a few recent ones.
+    actor_count = models.PositiveIntegerField(default=1)
+    sample_actors = models.JSONField(default=list, blank=True)
+    window_start = models.DateTimeField(null=True, blank=True)
+
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['recipient', 'is_read', '-timestamp'], name='notif_recipient_unread_idx'),
+            # The notification list filters on the recipient alone; the index above cannot order it
+            models.Index(fields=['recipient', '-timestamp'], name='notif_recipient_recent_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['recipient', 'verb', 'content_type', 'object_id', 'window_start'],
+                                    name='notification_coalesce_window_uniq'),
+        ]
+
+    def __str__(self):
+        return f'{self.actor.username} {self.verb} {self.target}'
+
+class NotificationEvent(models.Model):
+    # Outbox row written by the request path and turned into a Notification by the dispatch worker
+    recipient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    actor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    verb = models.CharField(max_length=255)
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    attempts = models.PositiveSmallIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+    failed = models.BooleanField(default=False)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['failed', 'available_at', 'id'], name='notif_event_ready_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.verb} event for {self.recipient_id}'
+
+
+class UnreadCounter(models.Model):
+    # Per-user unread badge, so polling clients cost a primary-key lookup instead of a scan
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='unread_counter')
+    count = models.PositiveIntegerField(default=0)
 
     def __str__(self):
-        return f'{self.actor.username} {self.verb} {self.target}'
\ No newline at end of file
+        return f'{self.count} unread for {self.user_id}'
@@ -1,27 +1,94 @@
+from collections import defaultdict
+from django.contrib.contenttypes.models import ContentType
 from rest_framework import serializers
 from .models import Notification
 from accounts.serializers import UserSerializer
+from posts.models import Post
 from posts.serializers import PostSerializer
+from social_media_api.dynamic_fields import DynamicFieldsMixin, child_spec
+from social_media_api.eager_loading import EagerLoadingMixin
 
-class NotificationSerializer(serializers.ModelSerializer):
+# Targets rendered with a full serializer; anything else gets the short id/type/content form
+TARGET_SERIALIZERS = {
+    Post: PostSerializer,
+}
+
+
+def resolve_targets(notifications, fields=None, expand=None):
+    """
+    Load the generic `target` of many notifications with one query per content type,
+    including the related rows the target's serializer needs, and attach the results
+    to the GenericForeignKey cache so `notification.target` costs no further query.
+    `fields`/`expand` are the sparse fieldset requested for the target.
+    """
+    wanted = defaultdict(set)
+    for notification in notifications:
+        wanted[notification.content_type_id].add(notification.object_id)
+
+    resolved = {}
+    for content_type_id, object_ids in wanted.items():
+        model = ContentType.objects.get_for_id(content_type_id).model_class()
+        if model is None:
+            continue
+        queryset = model._default_manager.filter(pk__in=object_ids)
+        serializer_class = TARGET_SERIALIZERS.get(model)
+        if serializer_class is not None and issubclass(serializer_class, EagerLoadingMixin):
+            queryset = serializer_class.setup_eager_loading(queryset, fields=fields, expand=expand)
+            only = serializer_class.get_only_paths(fields=fields, expand=expand) if fields is not None else None
+            if only is not None:
+                queryset = queryset.only(*only)
+        for target in queryset:
+            resolved[content_type_id, target.pk] = target
+
+    target_field = Notification._meta.get_field('target')
+    for notification in notifications:
+        target_field.set_cached_value(notification, resolved.get((notification.content_type_id, notification.object_id)))
+    return notifications
+
+
+class NotificationListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        notifications = list(data.all() if hasattr(data, 'all') else data)
+        if 'target_object' in self.child.fields:
+            resolve_targets(notifications, child_spec(self.child.field_spec, 'target_object'),
+                            self.child.expand_spec.get('target_object'))
+        return super().to_representation(notifications)
+
+
+class NotificationSerializer(DynamicFieldsMixin, EagerLoadingMixin, serializers.ModelSerializer):
     actor = UserSerializer(read_only=True)
     target_object = serializers.SerializerMethodField()
+    summary = serializers.SerializerMethodField()
+    field_dependencies = {
+        'target_object': ['content_type', 'object_id'],
+        'summary': ['actor__username', 'actor_count', 'verb', 'content_type'],
+    }
 
     class Meta:
         model = Notification
-        fields = ['id', 'actor', 'verb', 'target_object', 'timestamp', 'is_read']
+        fields = ['id', 'actor', 'verb', 'actor_count', 'sample_actors', 'summary',
+                  'target_object', 'timestamp', 'is_read']
+        list_serializer_class = NotificationListSerializer
+
+    def get_summary(self, obj):
+        # e.g. "alice and 41 others liked your post", built from columns already loaded
+        actors = obj.actor.username
+        if obj.actor_count > 1:
+            others = obj.actor_count - 1
+            actors += f" and {others} other{'s' if others > 1 else ''}"
+        return f'{actors} {obj.verb} your {ContentType.objects.get_for_id(obj.content_type_id).model}'
 
     def get_target_object(self, obj):
-        if isinstance(obj.target, type(obj.target)):
-            return {
-                'id': obj.target.id,
-                'content_type': obj.content_type.model,
-                'content': str(obj.target)
-            }
-        
-        # You would need to create a serializer for each target type
-        # For example, if the target is a Post, you could use PostSerializer
-        if obj.target:
-            if obj.content_type.model == 'post':
-                return PostSerializer(obj.target).data
-        return None
+        target = obj.target
+        if target is None:
+            return None
+
+        serializer_class = TARGET_SERIALIZERS.get(type(target))
+        if serializer_class is not None:
+            kwargs = self.nested_kwargs('target_object') if issubclass(serializer_class, DynamicFieldsMixin) else {}
+            return serializer_class(target, context=self.context, **kwargs).data
+        return {
+            'id': target.pk,
+            'content_type': ContentType.objects.get_for_id(obj.content_type_id).model,
+            'content': str(target)
+        }
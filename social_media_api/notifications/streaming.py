@@ -0,0 +1,185 @@
+import asyncio
+import json
+import threading
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Notification
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def event_id(notification):
+    # Coalesced notifications keep their id but move forward in time, so resume by timestamp
+    return int(notification.timestamp.timestamp() * 1_000_000)
+
+
+def format_event(notification_id, payload):
+    data = json.dumps(payload, cls=DjangoJSONEncoder, separators=(',', ':'))
+    return f'id: {notification_id}\nevent: notification\ndata: {data}\n\n'
+
+
+def render(notifications):
+    """Serialize a batch of notifications into (event id, SSE frame) pairs, keyed by recipient."""
+    from .serializers import NotificationSerializer
+
+    notifications = list(Notification.objects.filter(id__in=[n.id for n in notifications])
+                         .select_related('actor').order_by('timestamp'))
+    frames = {}
+    for notification, payload in zip(notifications, NotificationSerializer(notifications, many=True).data):
+        frames.setdefault(notification.recipient_id, []).append(
+            (event_id(notification), format_event(event_id(notification), payload)))
+    return frames
+
+
+def missed_since(user_id, last_event_id):
+    """Frames for notifications a reconnecting client missed after `last_event_id`."""
+    try:
+        since = datetime.fromtimestamp(int(last_event_id) / 1_000_000, tz=dt_timezone.utc)
+    except (TypeError, ValueError, OverflowError):
+        return []
+    limit = _setting('NOTIFICATIONS_STREAM_REPLAY_LIMIT', 100)
+    missed = list(Notification.objects.filter(recipient_id=user_id, timestamp__gt=since)
+                  .order_by('-timestamp')[:limit])
+    return render(missed).get(user_id, [])
+
+
+class InProcessBroker:
+    """
+    Fan-out of rendered frames to the SSE connections of this process.
+
+    Publishing may happen on any thread (e.g. a sync view delivering notifications); frames are
+    handed to each subscriber's event loop with call_soon_threadsafe.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers = {}
+
+    def subscribe(self, user_id):
+        queue = asyncio.Queue(maxsize=_setting('NOTIFICATIONS_STREAM_QUEUE_SIZE', 100))
+        with self.lock:
+            self.subscribers.setdefault(user_id, set()).add((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, user_id, queue):
+        with self.lock:
+            entries = self.subscribers.get(user_id, set())
+            entries.difference_update({entry for entry in entries if entry[1] is queue})
+            if not entries:
+                self.subscribers.pop(user_id, None)
+
+    def subscribed_users(self):
+        with self.lock:
+            return list(self.subscribers)
+
+    def publish(self, notifications):
+        """Called after notifications are written; renders only those with a listener."""
+        listening = set(self.subscribed_users())
+        notifications = [n for n in notifications if n.recipient_id in listening]
+        if notifications:
+            self.send(render(notifications))
+
+    def send(self, frames):
+        for user_id, user_frames in frames.items():
+            with self.lock:
+                entries = list(self.subscribers.get(user_id, ()))
+            for loop, queue in entries:
+                for frame in user_frames:
+                    loop.call_soon_threadsafe(self._offer, queue, frame)
+
+    @staticmethod
+    def _offer(queue, frame):
+        # A client that stopped reading loses frames instead of growing memory; it can resume
+        if not queue.full():
+            queue.put_nowait(frame)
+
+
+class PollingBroker(InProcessBroker):
+    """
+    Local stand-in for a message broker in multi-process setups, where notifications are
+    written by the `process_notifications` worker or another web worker. A single task per
+    process polls for new rows of the connected users and fans them out, so the database
+    sees one query per interval however many clients are idle.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.poller = None
+        self.sent = {}
+
+    def subscribe(self, user_id):
+        queue = super().subscribe(user_id)
+        if self.poller is None or self.poller.done():
+            self.cursor = timezone.now()
+            self.poller = asyncio.get_running_loop().create_task(self.poll())
+        return queue
+
+    def publish(self, notifications):
+        # The poller picks the rows up from the database
+        pass
+
+    async def poll(self):
+        interval = _setting('NOTIFICATIONS_STREAM_POLL_INTERVAL', 1.0)
+        while self.subscribed_users():
+            await asyncio.sleep(interval)
+            frames = await sync_to_async(self.fetch)()
+            self.send(frames)
+
+    def fetch(self):
+        # Rows can commit slightly out of timestamp order, so look back a little and skip repeats
+        overlap = timedelta(seconds=_setting('NOTIFICATIONS_STREAM_POLL_OVERLAP', 5))
+        since = self.cursor - overlap
+        rows = list(Notification.objects.filter(recipient_id__in=self.subscribed_users(), timestamp__gt=since)
+                    .only('id', 'recipient_id', 'timestamp').order_by('timestamp'))
+        fresh = [row for row in rows if self.sent.get(row.id) != row.timestamp]
+        for row in rows:
+            self.sent[row.id] = row.timestamp
+            self.cursor = max(self.cursor, row.timestamp)
+        self.sent = {pk: ts for pk, ts in self.sent.items() if ts > since}
+        return render(fresh) if fresh else {}
+
+
+_brokers = {}
+_brokers_lock = threading.Lock()
+
+
+def get_broker():
+    """The process-wide broker named by NOTIFICATIONS_STREAM_BROKER."""
+    path = _setting('NOTIFICATIONS_STREAM_BROKER', 'notifications.streaming.PollingBroker')
+    with _brokers_lock:
+        if path not in _brokers:
+            _brokers[path] = import_string(path)()
+        return _brokers[path]
+
+
+async def event_stream(user_id, last_event_id=None):
+    broker = get_broker()
+    queue = broker.subscribe(user_id)
+    heartbeat = _setting('NOTIFICATIONS_STREAM_HEARTBEAT', 15)
+    try:
+        yield f'retry: {int(heartbeat * 1000)}\n\n'
+        replayed = set()
+        if last_event_id:
+            for frame_id, frame in await sync_to_async(missed_since)(user_id, last_event_id):
+                replayed.add(frame_id)
+                yield frame
+        while True:
+            try:
+                frame_id, frame = await asyncio.wait_for(queue.get(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                # Comment line: keeps proxies from closing the idle connection
+                yield ': heartbeat\n\n'
+                continue
+            # Subscribed before the replay, so the live queue can repeat a replayed frame
+            if frame_id not in replayed:
+                yield frame
+    finally:
+        broker.unsubscribe(user_id, queue)
@@ -1,3 +1,239 @@
-from django.test import TestCase
+import time
+from datetime import timedelta
+from unittest import mock
+from asgiref.sync import sync_to_async
+from io import StringIO
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+from posts.models import Post
+from .dispatch import notify, process_batch
+from .streaming import PollingBroker, event_stream, get_broker
+from .models import Notification, NotificationEvent, UnreadCounter
+from .views import authenticate_stream
 
-# Create your tests here.
+User = get_user_model()
+
+
+class NotificationDispatchTests(TestCase):
+    def setUp(self):
+        self.actor = User.objects.create_user(username='actor')
+        self.recipient = User.objects.create_user(username='recipient')
+        self.post = Post.objects.create(author=self.recipient, title='t', content='c')
+
+    def fans(self, count):
+        return [User.objects.create_user(username=f'fan{i}') for i in range(count)]
+
+    @override_settings(NOTIFICATIONS_DISPATCH_MODE='outbox')
+    def test_outbox_events_are_delivered_by_the_worker(self):
+        for actor in self.fans(3):
+            notify(self.recipient, actor, 'liked', self.post)
+        self.assertEqual(Notification.objects.count(), 0)
+
+        call_command('process_notifications', '--once', '--batch-size', '2', stdout=StringIO())
+        notification = Notification.objects.get(recipient=self.recipient, verb='liked')
+        self.assertEqual(notification.actor_count, 3)
+        self.assertFalse(NotificationEvent.objects.exists())
+
+    @override_settings(NOTIFICATIONS_DISPATCH_MODE='sync')
+    def test_sync_mode_delivers_immediately_and_skips_self_notifications(self):
+        notify(self.recipient, self.actor, 'liked', self.post)
+        notify(self.recipient, self.recipient, 'liked', self.post)
+        self.assertEqual(Notification.objects.count(), 1)
+
+    @override_settings(NOTIFICATIONS_DISPATCH_MODE='outbox', NOTIFICATIONS_MAX_ATTEMPTS=2)
+    def test_failed_deliveries_are_retried_then_parked(self):
+        notify(self.recipient, self.actor, 'liked', self.post)
+        with mock.patch('notifications.dispatch.deliver', side_effect=DatabaseError('boom')):
+            process_batch()
+            event = NotificationEvent.objects.get()
+            self.assertEqual((event.attempts, event.failed), (1, False))
+
+            NotificationEvent.objects.update(available_at=event.created_at)
+            process_batch()
+        event.refresh_from_db()
+        self.assertEqual((event.attempts, event.failed, event.last_error), (2, True, 'boom'))
+        self.assertEqual(process_batch(), 0)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, NOTIFICATIONS_DISPATCH_MODE='sync')
+class NotificationCoalescingTests(APITestCase):
+    def setUp(self):
+        self.recipient = User.objects.create_user(username='recipient')
+        self.post = Post.objects.create(author=self.recipient, title='t', content='c')
+        self.fans = [User.objects.create_user(username=f'fan{i}') for i in range(5)]
+        self.client.force_authenticate(self.recipient)
+
+    def test_events_in_one_window_merge_into_a_single_row(self):
+        for fan in self.fans:
+            notify(self.recipient, fan, 'liked', self.post)
+        Notification.objects.update(is_read=True)
+        # A repeated recent actor refreshes the row but is not counted again
+        notify(self.recipient, self.fans[3], 'liked', self.post)
+
+        notification = Notification.objects.get()
+        self.assertEqual(notification.actor_count, 5)
+        self.assertFalse(notification.is_read)
+        self.assertEqual([actor['username'] for actor in notification.sample_actors], ['fan3', 'fan4', 'fan2'])
+
+        response = self.client.get(reverse('notification-list'))
+        self.assertEqual(response.data['results'][0]['summary'], 'fan3 and 4 others liked your post')
+
+    @override_settings(NOTIFICATIONS_COALESCE_WINDOW=0)
+    def test_zero_window_disables_coalescing(self):
+        for fan in self.fans[:2]:
+            notify(self.recipient, fan, 'liked', self.post)
+        self.assertEqual(Notification.objects.count(), 2)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, NOTIFICATIONS_COALESCE_WINDOW=0)
+class NotificationListQueryTests(APITestCase):
+    def setUp(self):
+        self.recipient = User.objects.create_user(username='recipient')
+        for i in range(12):
+            author = User.objects.create_user(username=f'author{i}')
+            post = Post.objects.create(author=author, title=str(i), content=str(i))
+            Notification.objects.create(recipient=self.recipient, actor=author, verb='mentioned', target=post)
+        # The GenericForeignKey goes through the ContentType cache, which is warm in production
+        ContentType.objects.get_for_model(Post)
+        self.client.force_authenticate(self.recipient)
+
+    def test_targets_are_resolved_in_one_query_per_content_type(self):
+        # count + notifications with actors + posts with authors, for a full and a partial page
+        for page, size in ((1, 10), (2, 2)):
+            with self.assertNumQueries(3):
+                response = self.client.get(reverse('notification-list'), {'page': page})
+            results = response.data['results']
+            self.assertEqual(len(results), size)
+            self.assertEqual(results[0]['target_object']['author']['username'], results[0]['actor']['username'])
+
+    def test_sparse_fieldsets_skip_unrendered_relations(self):
+        # count + notifications with actors; no target query when the target is not rendered
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('notification-list'), {'fields': 'id,summary'})
+        self.assertEqual(set(response.data['results'][0]), {'id', 'summary'})
+        self.assertEqual(response.data['results'][0]['summary'], 'author11 mentioned your post')
+
+        response = self.client.get(reverse('notification-list'), {'fields': 'target_object.content'})
+        self.assertEqual(response.data['results'][0], {'target_object': {'content': '11'}})
+
+    def test_deleted_targets_render_as_null(self):
+        Post.objects.filter(title='11').delete()
+        response = self.client.get(reverse('notification-list'))
+        self.assertIsNone(response.data['results'][0]['target_object'])
+        self.assertIsNotNone(response.data['results'][1]['target_object'])
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, NOTIFICATIONS_DISPATCH_MODE='sync')
+class UnreadCountTests(APITestCase):
+    def setUp(self):
+        self.recipient = User.objects.create_user(username='recipient')
+        self.actor = User.objects.create_user(username='actor')
+        self.posts = [Post.objects.create(author=self.recipient, title=str(i), content=str(i)) for i in range(2)]
+        self.client.force_authenticate(self.recipient)
+
+    def unread_count(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('notification-unread-count'))
+        return response.data['unread_count']
+
+    def test_counter_follows_delivery_and_mark_all_as_read(self):
+        for post in self.posts:
+            notify(self.recipient, self.actor, 'liked', post)
+        self.assertEqual(self.unread_count(), 2)
+
+        self.client.post(reverse('notification-mark-all-as-read'))
+        self.assertEqual(self.unread_count(), 0)
+
+        # Merging into a read notification makes it unread again
+        notify(self.recipient, self.actor, 'commented on', self.posts[0])
+        notify(self.recipient, User.objects.create_user(username='other'), 'liked', self.posts[0])
+        self.assertEqual(self.unread_count(), 2)
+
+    def test_missing_or_drifted_counters_are_reconciled(self):
+        Notification.objects.create(recipient=self.recipient, actor=self.actor, verb='liked', target=self.posts[0])
+        response = self.client.get(reverse('notification-unread-count'))
+        self.assertEqual(response.data['unread_count'], 1)
+
+        UnreadCounter.objects.filter(pk=self.recipient.pk).update(count=42)
+        call_command('reconcile_unread_counts', stdout=StringIO())
+        self.assertEqual(self.unread_count(), 1)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, NOTIFICATIONS_DISPATCH_MODE='sync',
+                   NOTIFICATIONS_STREAM_BROKER='notifications.streaming.InProcessBroker',
+                   NOTIFICATIONS_STREAM_HEARTBEAT=0.05)
+class NotificationStreamTests(TestCase):
+    def setUp(self):
+        self.recipient = User.objects.create_user(username='recipient')
+        self.actor = User.objects.create_user(username='actor')
+        self.post = Post.objects.create(author=self.recipient, title='t', content='c')
+
+    def deliver(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            notify(self.recipient, self.actor, 'liked', self.post)
+
+    async def test_new_notifications_are_pushed_between_heartbeats(self):
+        stream = event_stream(self.recipient.id)
+        self.assertTrue((await anext(stream)).startswith('retry:'))
+
+        await sync_to_async(self.deliver)()
+        frame = await anext(stream)
+        self.assertIn('event: notification', frame)
+        self.assertIn('"summary":"actor liked your post"', frame)
+
+        self.assertEqual(await anext(stream), ': heartbeat\n\n')
+        await stream.aclose()
+        self.assertEqual(get_broker().subscribed_users(), [])
+
+    async def test_reconnect_resumes_after_last_event_id(self):
+        await sync_to_async(self.deliver)()
+        stream = event_stream(self.recipient.id, last_event_id='0')
+        await anext(stream)
+        self.assertIn('event: notification', await anext(stream))
+        await stream.aclose()
+
+    async def test_stream_requires_a_token(self):
+        response = await self.async_client.get(reverse('notification-stream'))
+        self.assertEqual(response.status_code, 401)
+
+    def issue_ticket(self):
+        token = Token.objects.create(user=self.recipient)
+        return self.client.post(reverse('notification-stream-ticket'), HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def test_stream_ticket_opens_the_stream(self):
+        response = self.issue_ticket()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['expires_in'], 60)
+
+        request = RequestFactory().get('/', {'ticket': response.json()['ticket']})
+        self.assertEqual(authenticate_stream(request), self.recipient)
+
+    def test_expired_or_forged_tickets_are_rejected(self):
+        ticket = self.issue_ticket().json()['ticket']
+
+        with mock.patch('django.core.signing.time.time', return_value=time.time() + 61):
+            self.assertIsNone(authenticate_stream(RequestFactory().get('/', {'ticket': ticket})))
+        self.assertIsNone(authenticate_stream(RequestFactory().get('/', {'ticket': ticket + 'x'})))
+
+    def test_api_token_is_not_accepted_in_the_url(self):
+        token = Token.objects.create(user=self.recipient)
+        self.assertIsNone(authenticate_stream(RequestFactory().get('/', {'token': token.key})))
+        self.assertIsNone(authenticate_stream(RequestFactory().get('/', {'ticket': token.key})))
+        request = RequestFactory().get('/', HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.assertEqual(authenticate_stream(request), self.recipient)
+
+    def test_polling_broker_fetches_each_change_once(self):
+        broker = PollingBroker()
+        broker.subscribers = {self.recipient.id: set()}
+        broker.cursor = timezone.now() - timedelta(minutes=1)
+
+        self.deliver()
+        self.assertEqual(list(broker.fetch()), [self.recipient.id])
+        self.assertEqual(broker.fetch(), {})
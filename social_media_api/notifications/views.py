@@ -1,11 +1,30 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.http import JsonResponse, StreamingHttpResponse
 from rest_framework import viewsets, mixins, status
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.settings import api_settings
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from .models import Notification
 from .serializers import NotificationSerializer
+from .counters import get_unread_count, reset_unread
+from .streaming import event_stream
+from django.db import transaction
+from social_media_api.eager_loading import EagerLoadingViewMixin
 
-class NotificationViewSet(mixins.ListModelMixin,
+STREAM_TICKET_SALT = 'notifications.stream-ticket'
+
+
+def _ticket_ttl():
+    return getattr(settings, 'NOTIFICATIONS_STREAM_TICKET_TTL', 60)
+
+
+class NotificationViewSet(EagerLoadingViewMixin,
+                          mixins.ListModelMixin,
                           mixins.RetrieveModelMixin,
                           viewsets.GenericViewSet):
     serializer_class = NotificationSerializer
@@ -17,5 +36,64 @@ class NotificationViewSet(mixins.ListModelMixin,
     @action(detail=False, methods=['post'])
     def mark_all_as_read(self, request):
         unread_notifications = self.get_queryset().filter(is_read=False)
-        unread_notifications.update(is_read=True)
+        with transaction.atomic():
+            unread_notifications.update(is_read=True)
+            reset_unread(request.user.id)
         return Response({'detail': 'All notifications marked as read.'}, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'])
+    def unread_count(self, request):
+        return Response({'unread_count': get_unread_count(request.user.id)}, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['post'], url_path='stream-ticket')
+    def stream_ticket(self, request):
+        # For EventSource clients, which cannot send the Authorization header to the stream
+        ticket = signing.dumps(request.user.pk, salt=STREAM_TICKET_SALT)
+        return Response({'ticket': ticket, 'expires_in': _ticket_ttl()}, status=status.HTTP_201_CREATED)
+
+
+def authenticate_stream(request):
+    """
+    Token check for the SSE endpoint. Browsers' EventSource cannot send headers, so it
+    also accepts ?ticket= from POST /api/notifications/stream-ticket/: signed, good only
+    for opening the stream and only for NOTIFICATIONS_STREAM_TICKET_TTL seconds, unlike
+    the API token, which must stay out of URLs and the access logs that record them.
+    """
+    header = request.headers.get('Authorization', '')
+    if not header.startswith('Token '):
+        return _ticket_user(request.GET.get('ticket'))
+
+    key = header[len('Token '):]
+    if not key:
+        return None
+    for authentication_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        if hasattr(authentication_class, 'authenticate_credentials'):
+            try:
+                user, _ = authentication_class().authenticate_credentials(key)
+            except AuthenticationFailed:
+                return None
+            return user
+    return None
+
+
+def _ticket_user(ticket):
+    if not ticket:
+        return None
+    try:
+        user_id = signing.loads(ticket, salt=STREAM_TICKET_SALT, max_age=_ticket_ttl())
+    except signing.BadSignature:  # also raised once the ticket has expired
+        return None
+    return get_user_model().objects.filter(pk=user_id, is_active=True).first()
+
+
+async def notification_stream(request):
+    """Server-sent events: pushes each new notification of the user over one long-lived connection."""
+    user = await sync_to_async(authenticate_stream)(request)
+    if user is None:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    response = StreamingHttpResponse(event_stream(user.id, last_event_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,152 @@
+import json
+from collections import defaultdict
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Max
+from rest_framework import serializers
+from rest_framework.parsers import BaseParser
+
+from .models import Post
+from .search import get_search_backend
+from .timeline import fan_out_posts
+
+User = get_user_model()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class PostImportSerializer(serializers.ModelSerializer):
+    # Only field-level checks here; authors are looked up once per batch
+    author = serializers.IntegerField(required=False, min_value=1)
+
+    class Meta:
+        model = Post
+        fields = ['title', 'content', 'author']
+        extra_kwargs = {'title': {'required': False, 'allow_blank': True}}
+
+
+class NDJSONParser(BaseParser):
+    """application/x-ndjson: one JSON object per line; lines are decoded row by row by the importer."""
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        return [line.decode(encoding) for line in stream]
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.errors = []
+
+    def error(self, row, errors):
+        self.errors.append({'row': row, 'errors': errors})
+
+    def as_dict(self):
+        return {'created': self.created, 'errors': self.errors}
+
+
+def _validate(number, row, author, result):
+    if isinstance(row, (str, bytes)):
+        try:
+            row = json.loads(row)
+        except ValueError as exc:
+            result.error(number, {'non_field_errors': [f'Invalid JSON: {exc}']})
+            return None
+    if not isinstance(row, dict):
+        result.error(number, {'non_field_errors': ['Expected a JSON object.']})
+        return None
+
+    serializer = PostImportSerializer(data=row)
+    if not serializer.is_valid():
+        result.error(number, serializer.errors)
+        return None
+    data = serializer.validated_data
+    author_id = author.pk if author is not None else data.get('author')
+    if author_id is None:
+        result.error(number, {'author': ['This field is required.']})
+        return None
+    return Post(author_id=author_id, title=data.get('title', ''), content=data['content'])
+
+
+def _bulk_create(posts, batch_size):
+    if connection.features.can_return_rows_from_bulk_insert:
+        return Post.objects.bulk_create(posts, batch_size=batch_size)
+    # MySQL returns no ids; read the new rows back and match them on their values
+    last = Post.objects.aggregate(last=Max('pk'))['last'] or 0
+    Post.objects.bulk_create(posts, batch_size=batch_size)
+    waiting = defaultdict(list)
+    for post in posts:
+        waiting[(post.author_id, post.title, post.content)].append(post)
+    rows = (Post.objects.filter(pk__gt=last, author_id__in={post.author_id for post in posts})
+            .order_by('pk').values_list('pk', 'author_id', 'title', 'content'))
+    for pk, *values in rows.iterator():
+        matches = waiting.get(tuple(values))
+        if matches:
+            matches.pop(0).pk = pk
+    return posts
+
+
+def _save(batch, batch_size, result):
+    """bulk_create one validated batch; on a database error, save row by row to find the culprits."""
+    try:
+        with transaction.atomic():
+            created = _bulk_create([post for _, post in batch], batch_size=batch_size)
+    except DatabaseError:
+        created = []
+        for number, post in batch:
+            try:
+                with transaction.atomic():
+                    post.save()
+                created.append(post)
+            except DatabaseError as exc:
+                result.error(number, {'non_field_errors': [str(exc)]})
+    result.created += len(created)
+    # bulk_create sends no post_save and the view's fan-out never runs, so do both here
+    created = [post for post in created if post.pk is not None]
+    if created:
+        get_search_backend().index(created)
+        fan_out_posts(created)
+
+
+def import_posts(rows, author=None, batch_size=None):
+    """
+    Create posts from an iterable of rows (dicts, or JSON strings such as NDJSON lines,
+    where blank lines are skipped).
+
+    Rows are validated a batch at a time; invalid rows are reported by their 1-based
+    number and skipped, the rest of the batch is written with bulk_create in its own
+    transaction. With `author`, every post belongs to that user and row authors are
+    ignored; otherwise each row names its author by id.
+    """
+    batch_size = batch_size or _setting('POSTS_IMPORT_BATCH_SIZE', 1000)
+    result = ImportResult()
+    rows = iter(enumerate(rows, start=1))
+    while True:
+        chunk = list(islice(rows, batch_size))
+        if not chunk:
+            break
+        batch = []
+        for number, row in chunk:
+            if isinstance(row, str) and not row.strip():
+                continue  # blank NDJSON line; keeps row numbers equal to line numbers
+            post = _validate(number, row, author, result)
+            if post is not None:
+                batch.append((number, post))
+
+        if author is None:
+            known = set(User.objects.filter(id__in={post.author_id for _, post in batch})
+                        .values_list('id', flat=True))
+            for number, post in batch:
+                if post.author_id not in known:
+                    result.error(number, {'author': [f'Invalid pk "{post.author_id}" - object does not exist.']})
+            batch = [(number, post) for number, post in batch if post.author_id in known]
+        if batch:
+            _save(batch, batch_size, result)
+    result.errors.sort(key=lambda error: error['row'])
+    return result
@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.checks import Error, register
+
+from .response_cache import is_process_local
+
+
+@register()
+def check_response_cache(app_configs, **kwargs):
+    alias = getattr(settings, 'POSTS_RESPONSE_CACHE', None)
+    if alias is None or alias not in settings.CACHES or not is_process_local(alias):
+        return []
+    return [Error(
+        f'POSTS_RESPONSE_CACHE points at the process-local cache {alias!r}.',
+        hint='Other workers would keep serving edited and deleted posts. Use a cache shared by every '
+             'process (Redis, Memcached, database) or set POSTS_RESPONSE_CACHE = None.',
+        id='posts.E001',
+    )]
@@ -0,0 +1,95 @@
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.http import Http404
+from django.utils import timezone
+from .models import Post, Like
+from .response_cache import invalidate_posts
+
+# Inserts the like only if the post exists and the user has not liked it yet. Two concurrent
+# double-taps can both pass the NOT EXISTS check; the unique (user, post) index rejects one.
+LIKE_SQL = (
+    'INSERT INTO {like} (user_id, post_id, created_at) '
+    'SELECT %s, id, %s FROM {post} WHERE id = %s '
+    'AND NOT EXISTS (SELECT 1 FROM {like} WHERE user_id = %s AND post_id = %s)'
+).format(like=Like._meta.db_table, post=Post._meta.db_table)
+
+
+def _adjust_likes_count(post_ids, delta):
+    Post.objects.filter(id__in=post_ids).update(likes_count=F('likes_count') + delta)
+    # Raw and bulk writes send no model signals
+    invalidate_posts(post_ids)
+
+
+def _insert_like(user, post_id):
+    # True if this statement added the like; a concurrent duplicate raises IntegrityError
+    created_at = connection.ops.adapt_datetimefield_value(timezone.now())
+    try:
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(LIKE_SQL, [user.id, created_at, post_id, user.id, post_id])
+                return cursor.rowcount == 1
+    except IntegrityError:
+        return False
+
+
+def like(user, post_id):
+    """
+    Idempotently like a post. Returns the post author's id when a like was added and
+    None when the user had already liked it. Raises Http404 for a missing post.
+    """
+    with transaction.atomic():
+        created = _insert_like(user, post_id)
+        if created:
+            _adjust_likes_count([post_id], 1)
+
+    if created:
+        return Post.objects.filter(pk=post_id).values_list('author_id', flat=True).get()
+    if not Post.objects.filter(pk=post_id).exists():
+        raise Http404('No Post matches the given query.')
+    return None
+
+
+def unlike(user, post_id):
+    """Idempotently remove a like. Returns True if a like was removed. Raises Http404 for a missing post."""
+    with transaction.atomic():
+        deleted, _ = Like.objects.filter(user=user, post_id=post_id).delete()
+        if deleted:
+            _adjust_likes_count([post_id], -1)
+    if not deleted and not Post.objects.filter(pk=post_id).exists():
+        raise Http404('No Post matches the given query.')
+    return bool(deleted)
+
+
+def bulk_like(user, post_ids):
+    """
+    Like many posts at once. Returns {post_id: author_id} for the likes that were added.
+    Counters move only for rows this call inserted, even when a concurrent request likes
+    the same posts.
+    """
+    post_ids = set(post_ids)
+    already_liked = set(Like.objects.filter(user=user, post_id__in=post_ids).values_list('post_id', flat=True))
+    authors = dict(Post.objects.filter(id__in=post_ids - already_liked).values_list('id', 'author_id'))
+    if not authors:
+        return authors
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                Like.objects.bulk_create([Like(user=user, post_id=post_id) for post_id in authors])
+        except IntegrityError:
+            # Some of them were liked meanwhile; insert one by one to learn which rows are ours
+            authors = {post_id: author_id for post_id, author_id in authors.items() if _insert_like(user, post_id)}
+        if authors:
+            _adjust_likes_count(authors, 1)
+    return authors
+
+
+def bulk_unlike(user, post_ids):
+    """Unlike many posts at once. Returns the ids of the posts whose like was removed."""
+    with transaction.atomic():
+        # Locking the rows first means a concurrent unlike cannot delete them between the read and the delete
+        likes = Like.objects.select_for_update().filter(user=user, post_id__in=set(post_ids))
+        removed = list(likes.values_list('post_id', flat=True))
+        if removed:
+            Like.objects.filter(user=user, post_id__in=removed).delete()
+            _adjust_likes_count(removed, -1)
+    return removed
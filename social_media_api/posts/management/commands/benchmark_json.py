@@ -0,0 +1,61 @@
+import json
+import time
+from datetime import timedelta
+from io import BytesIO
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from posts.models import Post
+from posts.serializers import PostSerializer
+from social_media_api import fast_json
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ("Compare DRF's stdlib JSON renderer/parser with the orjson-backed ones on a feed page. "
+            'Runs in memory; nothing is written to the database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, default=100)
+        parser.add_argument('--iterations', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        page = self.feed_page(options['page_size'])
+        body = JSONRenderer().render(page)
+        if fast_json.orjson is None:
+            self.stdout.write(self.style.WARNING('orjson is not installed; the fast classes fall back to stdlib json.'))
+        if json.loads(fast_json.FastJSONRenderer().render(page)) != json.loads(body):
+            self.stdout.write(self.style.ERROR('Renderers disagree on the page content.'))
+
+        n = options['iterations']
+        self.stdout.write(f'{options["page_size"]}-post feed page, {len(body)} bytes, {n} iterations')
+        self.compare('render', lambda: JSONRenderer().render(page),
+                     lambda: fast_json.FastJSONRenderer().render(page), n)
+        self.compare('parse', lambda: JSONParser().parse(BytesIO(body)),
+                     lambda: fast_json.FastJSONParser().parse(BytesIO(body)), n)
+
+    def feed_page(self, size):
+        # Unsaved rows shaped like a real page, serialized exactly as the feed does
+        now = timezone.now()
+        authors = [User(id=i, username=f'user{i}', email=f'user{i}@example.com', bio='Ünïcode bio ✓ ' * 3,
+                        followers_count=i * 7, following_count=i) for i in range(1, 21)]
+        posts = [Post(id=i, author=authors[i % len(authors)], title=f'Post {i}', content='Lorem ipsum dolor sit amet. ' * 8,
+                      created_at=now - timedelta(minutes=i), likes_count=i * 3, comments_count=i % 11)
+                 for i in range(1, size + 1)]
+        return {'next': 'https://example.com/api/feed/?cursor=eyJwIjpbXX0', 'previous': None,
+                'results': PostSerializer(posts, many=True).data}
+
+    def compare(self, label, stdlib, fast, iterations):
+        old, new = self.time(stdlib, iterations), self.time(fast, iterations)
+        self.stdout.write(f'{label:<6} stdlib {old:8.1f} µs/page   fast {new:8.1f} µs/page   {old / new:4.1f}x')
+
+    def time(self, func, iterations):
+        func()
+        start = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        return (time.perf_counter() - start) / iterations * 1_000_000
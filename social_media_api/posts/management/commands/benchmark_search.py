@@ -0,0 +1,99 @@
+import random
+import statistics
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from posts.models import Post
+from posts.search import MAX_RESULTS, get_search_backend
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Compare the full-text search backend with the old icontains SearchFilter. '
+            'Generates the posts in the configured database and deletes them afterwards.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=1_000_000)
+        parser.add_argument('--queries', type=int, default=20)
+        parser.add_argument('--vocabulary', type=int, default=20_000)
+        parser.add_argument('--batch-size', type=int, default=10_000)
+        parser.add_argument('--page-size', type=int, default=10)
+        parser.add_argument('--keep', action='store_true', help='Keep the generated posts.')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        words = [f'w{n}' for n in range(options['vocabulary'])]
+        # Zipf-like word frequencies, like real text
+        weights = [1 / (rank + 1) for rank in range(len(words))]
+        backend = get_search_backend()
+        author = User.objects.create_user(username=f'search-benchmark-{uuid.uuid4().hex[:8]}')
+
+        try:
+            self.generate(author, rng, words, weights, backend, options)
+            queries = [' '.join(rng.sample(words[50:2000], 2)) for _ in range(options['queries'])]
+            page_size = options['page_size']
+
+            old = self.time_queries(queries, lambda q: self.search_filter_page(q, page_size))
+            new = self.time_queries(queries, lambda q: self.backend_page(backend, q, page_size))
+
+            self.stdout.write(f'{options["posts"]} posts, {len(queries)} two-term queries, backend {type(backend).__name__}')
+            self.report('SearchFilter (icontains)', old)
+            self.report('Full-text backend', new)
+        finally:
+            if not options['keep']:
+                self.cleanup(author, backend, options['batch_size'])
+
+    def generate(self, author, rng, words, weights, backend, options):
+        remaining = options['posts']
+        while remaining:
+            size = min(options['batch_size'], remaining)
+            posts = Post.objects.bulk_create([
+                Post(author=author,
+                     title=' '.join(rng.choices(words, weights, k=6)),
+                     content=' '.join(rng.choices(words, weights, k=40)))
+                for _ in range(size)
+            ])
+            # bulk_create skips the post_save signal that normally keeps the index in sync
+            if posts and posts[0].pk is None:
+                posts = list(Post.objects.filter(author=author).order_by('-id')[:size])
+            backend.index(posts)
+            remaining -= size
+            self.stdout.write(f'  generated {options["posts"] - remaining} posts', ending='\r')
+        self.stdout.write('')
+
+    def cleanup(self, author, backend, batch_size):
+        # author.delete() would cascade through the Post post_delete receivers one row at a
+        # time; the generated posts have nothing but index entries, so delete them in bulk
+        posts = Post.objects.filter(author=author)
+        while ids := list(posts.values_list('id', flat=True)[:batch_size]):
+            backend.remove(ids)
+            Post.objects.filter(id__in=ids)._raw_delete(posts.db)
+        author.delete()
+
+    def search_filter_page(self, query, page_size):
+        condition = Q()
+        for term in query.split():
+            condition &= Q(title__icontains=term) | Q(content__icontains=term)
+        return list(Post.objects.filter(condition).order_by('-created_at')[:page_size])
+
+    def backend_page(self, backend, query, page_size):
+        post_ids = backend.search(query, MAX_RESULTS)[:page_size]
+        return list(Post.objects.filter(id__in=post_ids))
+
+    def time_queries(self, queries, run):
+        timings = []
+        for query in queries:
+            start = time.perf_counter()
+            run(query)
+            timings.append((time.perf_counter() - start) * 1000)
+        return timings
+
+    def report(self, label, timings):
+        timings = sorted(timings)
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        self.stdout.write(f'{label:<28} mean {statistics.mean(timings):9.2f} ms   p95 {p95:9.2f} ms')
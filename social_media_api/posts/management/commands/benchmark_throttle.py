@@ -0,0 +1,56 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from rest_framework.views import APIView
+from social_media_api import throttling
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('Measure what BucketThrottle adds to a request: building the throttle and taking a token '
+            'for one of many users, with in-process and shared-cache buckets. Nothing is written.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=100000)
+        parser.add_argument('--users', type=int, default=1000, help='Distinct clients the requests come from.')
+        parser.add_argument('--cache', default='default', help='Cache alias used for the shared variant.')
+        parser.add_argument('--max-us', type=float, default=50,
+                            help='Fail when the in-process throttle costs more than this per request.')
+
+    def handle(self, *args, **options):
+        factory = APIRequestFactory()
+        requests = []
+        for i in range(options['users']):
+            request = Request(factory.post('/api/posts/1/like/'))
+            request.user = User(id=i + 1, username=f'user{i}')  # unsaved; only the pk is used
+            requests.append(request)
+        view = APIView()
+        view.throttle_scope = 'benchmark'
+
+        # A rate no client reaches, so every call does the full bookkeeping of an allowed request
+        rates = {'benchmark': '1000000/s'}
+        with override_settings(REST_FRAMEWORK={'DEFAULT_THROTTLE_RATES': rates}):
+            local = self.time(requests, view, options['iterations'])
+            with override_settings(THROTTLE_CACHE=options['cache']):
+                shared = self.time(requests, view, options['iterations'])
+        throttling.local_buckets.clear()
+
+        self.stdout.write(f'{options["iterations"]} requests from {options["users"]} clients')
+        self.stdout.write(f'in-process buckets   {local:6.2f} µs/request')
+        self.stdout.write(f'shared-cache buckets {shared:6.2f} µs/request ({options["cache"]} cache)')
+        if local > options['max_us']:
+            raise CommandError(f'In-process throttling costs {local:.2f} µs, over the {options["max_us"]} µs budget.')
+
+    def time(self, requests, view, iterations):
+        count = len(requests)
+        started = time.perf_counter()
+        for i in range(iterations):
+            # DRF builds a fresh throttle for every request, so that is part of the cost
+            if not throttling.BucketThrottle().allow_request(requests[i % count], view):
+                raise CommandError('The benchmark rate was exceeded; use fewer iterations.')
+        return (time.perf_counter() - started) / iterations * 1_000_000
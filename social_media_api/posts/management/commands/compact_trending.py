@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+from posts.trending import compact
+
+
+class Command(BaseCommand):
+    help = 'Decay and prune trending scores and publish the top-K list served by /api/posts/trending/.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=None,
+                            help='Keep running and compact every INTERVAL seconds (e.g. TRENDING_COMPACT_INTERVAL).')
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                removed = compact()
+                self.stdout.write(self.style.SUCCESS(f'Compacted trending scores, removed {removed} post(s).'))
+                if options['interval'] is None:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,68 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from notifications.models import Notification
+from posts.models import Comment, Like, Post, TimelineEntry
+
+# Plan fragments that mean "read the whole table"
+FULL_SCAN_PATTERNS = {
+    'sqlite': re.compile(r'\bSCAN (?!.*\bUSING\b)(?!CONSTANT)\w+'),
+    'postgresql': re.compile(r'Seq Scan on'),
+    'mysql': re.compile(r'"access_type":\s*"ALL"'),
+}
+
+# Plan fragments that mean "sort the matching rows": the index finds them but not in order
+SORT_PATTERNS = {
+    'sqlite': re.compile(r'\bUSE TEMP B-TREE FOR (?:ORDER BY|GROUP BY|DISTINCT)'),
+    'postgresql': re.compile(r'^\s*(?:->\s*)?(?:Incremental )?Sort\s+\(', re.MULTILINE),
+    'mysql': re.compile(r'"using_(?:filesort|temporary_table)":\s*true'),
+}
+
+
+def hot_querysets(user_id=1, post_id=1):
+    """The querysets behind the hottest endpoints, filtered and ordered the way the views do it."""
+    return {
+        'feed': TimelineEntry.objects.filter(user_id=user_id).order_by('-created_at', '-post_id')[:11],
+        'post list': Post.objects.order_by('-created_at', '-id')[:11],
+        'posts by author': Post.objects.filter(author_id=user_id).order_by('-created_at')[:11],
+        'comment list': Comment.objects.filter(post=post_id).order_by('-created_at', '-id')[:11],
+        'likes of a post': Like.objects.filter(post_id=post_id).order_by('-created_at')[:11],
+        'notification list': Notification.objects.filter(recipient_id=user_id).order_by('-timestamp')[:11],
+        # An UPDATE, so Meta.ordering does not apply
+        'mark_all_as_read': Notification.objects.filter(recipient_id=user_id, is_read=False).order_by(),
+    }
+
+
+class Command(BaseCommand):
+    help = ('EXPLAIN the hot-path querysets and fail if any of them falls back to a full table scan '
+            'or has to sort its rows.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plans', action='store_true', help='Print every plan.')
+
+    def handle(self, *args, **options):
+        vendor = connection.vendor
+        pattern, sort_pattern = FULL_SCAN_PATTERNS.get(vendor), SORT_PATTERNS.get(vendor)
+        if pattern is None:
+            raise CommandError(f'No full-scan detection for the {vendor} backend.')
+
+        failures = []
+        with transaction.atomic():
+            if vendor == 'postgresql':
+                # Small tables make seq scans look cheap; ask whether an index path exists at all
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+
+            for name, queryset in hot_querysets().items():
+                plan = queryset.explain(format='json') if vendor == 'mysql' else queryset.explain()
+                problem = 'FULL SCAN' if pattern.search(plan) else 'SORT' if sort_pattern.search(plan) else None
+                if problem:
+                    failures.append(f'{name} ({problem.lower()})')
+                status = self.style.ERROR(problem) if problem else self.style.SUCCESS('indexed')
+                self.stdout.write(f'{name:<20} {status}')
+                if problem or options['verbose_plans']:
+                    self.stdout.write('    ' + plan.replace('\n', '\n    '))
+
+        if failures:
+            raise CommandError(f'Unindexed plans: {", ".join(failures)}')
@@ -0,0 +1,226 @@
+import math
+import random
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from accounts.graph import Follow, forget
+from notifications.models import Notification, UnreadCounter
+from posts.models import Comment, Like, Post, TimelineEntry
+
+User = get_user_model()
+
+WORDS = ('lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor incididunt ut labore '
+         'et dolore magna aliqua enim ad minim veniam quis nostrud exercitation ullamco laboris nisi aliquip '
+         'ex ea commodo consequat duis aute irure in reprehenderit voluptate velit esse cillum').split()
+
+
+class Command(BaseCommand):
+    help = ('Generate a synthetic social graph for load testing: users with a power-law follower '
+            'distribution, posts, comments, likes, notifications and home timelines.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--following', type=float, default=20,
+                            help='Median number of accounts each user follows.')
+        parser.add_argument('--alpha', type=float, default=2.2,
+                            help='Exponent of the follower-count power law, P(k) ~ k^-alpha (> 1).')
+        parser.add_argument('--posts', type=float, default=10, help='Mean posts per user.')
+        parser.add_argument('--likes', type=float, default=5,
+                            help='Mean likes per post; scaled by the author\'s follower count.')
+        parser.add_argument('--comments', type=float, default=2,
+                            help='Mean comments per post; scaled by the author\'s follower count.')
+        parser.add_argument('--follow-notifications', type=int, default=50,
+                            help='Most "started following you" notifications kept per user.')
+        parser.add_argument('--read-ratio', type=float, default=0.8, help='Share of notifications already read.')
+        parser.add_argument('--days', type=float, default=30, help='Spread post timestamps over this many days.')
+        parser.add_argument('--prefix', default='load', help='Username prefix of the generated users.')
+        parser.add_argument('--password', default='loadtest', help='Password of every generated user.')
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help='Database alias to write to.')
+
+    def handle(self, *args, **options):
+        if options['alpha'] <= 1:
+            raise CommandError('--alpha must be greater than 1.')
+        if options['users'] < 2:
+            raise CommandError('--users must be at least 2.')
+        if options['database'] not in connections:
+            raise CommandError(f'Unknown database alias {options["database"]}.')
+        self.db = options['database']
+        self.batch_size = options['batch_size']
+        self.rng = random.Random(options['seed'])
+        self.now = timezone.now()
+        started = time.perf_counter()
+
+        with transaction.atomic(using=self.db):
+            follows = self.follow_graph(options)
+            users = self.create_users(follows, options)
+            posts, engagement = self.create_posts(users, options)
+            notifications = self.create_notifications(users, follows, posts, engagement, options)
+            entries = self.create_timelines(users, follows, posts)
+        # Fresh ids may still have follow-graph entries cached from deleted users
+        forget([user.pk for user in users])
+
+        likes, comments = (sum(len(actors) for (verb, _), actors in engagement.items() if verb == kind)
+                           for kind in ('liked', 'commented on'))
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {len(users)} users, {len(follows)} follows, {len(posts)} posts, {comments} comments, '
+            f'{likes} likes, {notifications} notifications and {entries} timeline entries '
+            f'in {time.perf_counter() - started:.1f}s.'))
+
+    def insert(self, objects, created=None):
+        """bulk_create `objects`; where the backend returns no ids, read them back from `created`."""
+        model = type(objects[0]) if objects else None
+        if model is None:
+            return objects
+        model.objects.using(self.db).bulk_create(objects, batch_size=self.batch_size)
+        if created is not None and objects[0].pk is None:
+            for obj, pk in zip(objects, created.order_by('pk').values_list('pk', flat=True)):
+                obj.pk = pk
+        return objects
+
+    def text(self, low, high):
+        return ' '.join(self.rng.choices(WORDS, k=self.rng.randint(low, high)))
+
+    def follow_graph(self, options):
+        """
+        Follow edges as (follower, followed) user indexes. Each user follows a log-normally
+        distributed number of accounts picked with Zipf weights, so follower counts follow a
+        power law with exponent `alpha`.
+        """
+        n = options['users']
+        weights = [(rank + 1) ** (-1 / (options['alpha'] - 1)) for rank in range(n)]
+        self.rng.shuffle(weights)
+        cumulative, total = [], 0
+        for weight in weights:
+            total += weight
+            cumulative.append(total)
+
+        follows = set()
+        for follower in range(n):
+            wanted = min(n - 1, max(1, round(self.rng.lognormvariate(math.log(options['following']), 1))))
+            targets = set()
+            for _ in range(10):  # popular accounts are drawn repeatedly; top up a few times
+                targets.update(self.rng.choices(range(n), cum_weights=cumulative, k=wanted - len(targets)))
+                targets.discard(follower)
+                if len(targets) >= wanted:
+                    break
+            follows.update((follower, target) for target in targets)
+        return follows
+
+    def create_users(self, follows, options):
+        prefix, count = options['prefix'], options['users']
+        taken = User.objects.using(self.db).filter(username__startswith=prefix).count()
+        password = make_password(options['password'])  # hashing once keeps this fast
+        users = [User(username=f'{prefix}{taken + i}', email=f'{prefix}{taken + i}@example.com',
+                      password=password, bio=self.text(0, 12)) for i in range(count)]
+        for follower, target in follows:
+            users[follower].following_count += 1
+            users[target].followers_count += 1
+        self.insert(users, User.objects.using(self.db).filter(username__in=[user.username for user in users]))
+
+        Token.objects.using(self.db).bulk_create([Token(key=Token.generate_key(), user=user) for user in users],
+                                                 batch_size=self.batch_size)
+        # Follow rows read "from_user is followed by to_user"
+        self.insert([Follow(from_user_id=users[target].pk, to_user_id=users[follower].pk)
+                     for follower, target in follows])
+        return users
+
+    def create_posts(self, users, options):
+        """
+        Posts with likes and comments, more of them on posts by popular authors.
+        Returns the posts and {(verb, post index): [user index]} of who engaged with them.
+        """
+        n = len(users)
+        mean_followers = sum(user.followers_count for user in users) / n + 1
+        posts, engagement = [], {}
+        for author, user in enumerate(users):
+            popularity = (user.followers_count + 1) / mean_followers
+            for _ in range(round(self.rng.expovariate(1 / options['posts'])) if options['posts'] else 0):
+                for verb, mean in (('liked', options['likes']), ('commented on', options['comments'])):
+                    count = min(n - 1, round(self.rng.expovariate(1 / (mean * popularity)))) if mean else 0
+                    actors = [i for i in self.rng.sample(range(n), min(n, count + 1)) if i != author][:count]
+                    engagement[(verb, len(posts))] = actors
+                posts.append(Post(author=user, title=self.text(2, 6).capitalize(), content=self.text(8, 40),
+                                  likes_count=len(engagement[('liked', len(posts))]),
+                                  comments_count=len(engagement[('commented on', len(posts))])))
+        self.insert(posts, Post.objects.using(self.db).filter(author__in=users))
+
+        # auto_now_add stamps every row with the same time; spread them out afterwards
+        span = options['days'] * 86400
+        for post in posts:
+            post.created_at = post.updated_at = self.now - timedelta(seconds=self.rng.uniform(0, span))
+        Post.objects.using(self.db).bulk_update(posts, ['created_at', 'updated_at'], batch_size=self.batch_size)
+
+        likes, comments = [], []
+        for (verb, number), actors in engagement.items():
+            for actor in actors:
+                if verb == 'liked':
+                    likes.append(Like(user=users[actor], post=posts[number]))
+                else:
+                    comments.append(Comment(author=users[actor], post=posts[number], content=self.text(3, 25)))
+        self.insert(likes)
+        self.insert(comments)
+        return posts, engagement
+
+    def create_notifications(self, users, follows, posts, engagement, options):
+        # Rows shaped like the dispatcher's coalesced output: one per recipient, verb and target
+        post_type = ContentType.objects.db_manager(self.db).get_for_model(Post)
+        user_type = ContentType.objects.db_manager(self.db).get_for_model(User)
+        notifications = []
+
+        def add(recipient, verb, content_type, object_id, actors):
+            samples = [{'id': users[i].pk, 'username': users[i].username} for i in reversed(actors[-3:])]
+            notifications.append(Notification(
+                recipient=recipient, actor=users[actors[-1]], verb=verb, content_type=content_type,
+                object_id=object_id, actor_count=len(actors), sample_actors=samples,
+                is_read=self.rng.random() < options['read_ratio']))
+
+        for (verb, number), actors in engagement.items():
+            if actors:
+                post = posts[number]
+                add(post.author, verb, post_type, post.pk, actors)
+
+        followers = defaultdict(list)
+        for follower, target in follows:
+            followers[target].append(follower)
+        for target, actors in followers.items():
+            for follower in actors[:options['follow_notifications']]:
+                add(users[target], 'started following', user_type, users[target].pk, [follower])
+
+        self.insert(notifications)
+        unread = defaultdict(int)
+        for notification in notifications:
+            if not notification.is_read:
+                unread[notification.recipient.pk] += 1
+        UnreadCounter.objects.using(self.db).bulk_create(
+            [UnreadCounter(user_id=user.pk, count=unread[user.pk]) for user in users], batch_size=self.batch_size)
+        return len(notifications)
+
+    def create_timelines(self, users, follows, posts):
+        # The same rows backfill_timeline writes: the recent posts of every followed author
+        limit = getattr(settings, 'TIMELINE_BACKFILL_SIZE', 200)
+        recent = defaultdict(list)
+        for post in sorted(posts, key=lambda post: post.created_at, reverse=True):
+            if len(recent[post.author_id]) < limit:
+                recent[post.author_id].append(post)
+
+        entries = 0
+        batch = []
+        for follower, target in follows:
+            for post in recent[users[target].pk]:
+                batch.append(TimelineEntry(user=users[follower], post=post, author_id=post.author_id,
+                                           created_at=post.created_at))
+            if len(batch) >= self.batch_size:
+                entries += len(self.insert(batch))
+                batch = []
+        return entries + len(self.insert(batch))
@@ -0,0 +1,37 @@
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from posts.bulk_import import import_posts
+
+
+class Command(BaseCommand):
+    help = 'Import posts from NDJSON files (one {"author": <id>, "title": ..., "content": ...} per line).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='+', help='NDJSON files; "-" reads standard input.')
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Rows per validation batch and transaction (POSTS_IMPORT_BATCH_SIZE).')
+        parser.add_argument('--author', default=None, help='Username that owns every imported post.')
+
+    def handle(self, *args, **options):
+        author = None
+        if options['author']:
+            try:
+                author = get_user_model().objects.get(username=options['author'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f'No user named {options["author"]}.')
+
+        created = failed = 0
+        for path in options['files']:
+            stream = sys.stdin if path == '-' else open(path, encoding='utf-8')
+            try:
+                result = import_posts(stream, author=author, batch_size=options['batch_size'])
+            finally:
+                if stream is not sys.stdin:
+                    stream.close()
+            for error in result.errors:
+                self.stderr.write(f'{path}:{error["row"]}: {error["errors"]}')
+            created += result.created
+            failed += len(result.errors)
+        self.stdout.write(self.style.SUCCESS(f'Imported {created} post(s), {failed} row(s) rejected.'))
@@ -0,0 +1,176 @@
+import json
+import math
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from posts.models import Post
+from social_media_api.query_budget import QueryStats, recording
+
+ENDPOINTS = ('feed', 'like', 'comment', 'notifications')
+
+
+def parse_mix(value):
+    """'feed=60,like=20' -> {'feed': 60.0, 'like': 20.0}"""
+    mix = {}
+    for part in filter(None, value.split(',')):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise CommandError(f'Unknown endpoint {name!r} in --mix; choose from {", ".join(ENDPOINTS)}.')
+        try:
+            mix[name] = float(weight)
+        except ValueError:
+            raise CommandError(f'Invalid weight for {name} in --mix.')
+    if not mix or sum(mix.values()) <= 0:
+        raise CommandError('--mix needs at least one positive weight.')
+    return mix
+
+
+def percentile(ordered, fraction):
+    # Nearest-rank percentile of an already sorted list
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+class Command(BaseCommand):
+    help = ('Replay a weighted mix of feed, like, comment and notification requests as generated users '
+            'and report latency percentiles and queries per request for each endpoint.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default=None,
+                            help='Server to load, e.g. http://127.0.0.1:8000; queries are counted when it '
+                                 'sends X-Query-Count. Without it requests are served in this process.')
+        parser.add_argument('--mix', default='feed=50,like=20,comment=10,notifications=20',
+                            help='Relative weight of each endpoint.')
+        parser.add_argument('--concurrency', type=int, default=8, help='Simultaneous clients.')
+        parser.add_argument('--requests', type=int, default=1000, help='Total requests to send.')
+        parser.add_argument('--duration', type=float, default=None, help='Stop after this many seconds.')
+        parser.add_argument('--prefix', default='load', help='Act as users whose username starts with this.')
+        parser.add_argument('--users', type=int, default=500, help='How many of those users to act as.')
+        parser.add_argument('--posts', type=int, default=1000, help='Like and comment on the newest N posts.')
+        parser.add_argument('--timeout', type=float, default=30)
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        mix = parse_mix(options['mix'])
+        self.endpoints, self.weights = list(mix), list(mix.values())
+        self.tokens = list(Token.objects.filter(user__username__startswith=options['prefix'])
+                           .order_by('user_id').values_list('key', flat=True)[:options['users']])
+        self.post_ids = list(Post.objects.order_by('-created_at').values_list('id', flat=True)[:options['posts']])
+        if not self.tokens:
+            raise CommandError(f'No users named {options["prefix"]}*; run generate_dataset first.')
+        if not self.post_ids and {'like', 'comment'} & set(mix):
+            raise CommandError('There are no posts to like or comment on.')
+
+        self.options = options
+        self.remaining = options['requests']
+        self.deadline = time.monotonic() + options['duration'] if options['duration'] else None
+        self.lock = threading.Lock()
+
+        # The in-process test client talks to the app as host "testserver"
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            started = time.perf_counter()
+            results = self.run(options['concurrency'], options['seed'])
+            elapsed = time.perf_counter() - started
+        self.report(results, elapsed)
+
+    def run(self, concurrency, seed):
+        if concurrency <= 1:
+            return self.worker(random.Random(seed))
+        with ThreadPoolExecutor(concurrency) as pool:
+            futures = [pool.submit(self.threaded_worker, random.Random(None if seed is None else seed + i))
+                       for i in range(concurrency)]
+            return [result for future in futures for result in future.result()]
+
+    def threaded_worker(self, rng):
+        try:
+            return self.worker(rng)
+        finally:
+            connection.close()  # each thread opened its own
+
+    def take(self):
+        with self.lock:
+            if self.remaining <= 0 or (self.deadline and time.monotonic() >= self.deadline):
+                return False
+            self.remaining -= 1
+            return True
+
+    def worker(self, rng):
+        """Send requests until the budget runs out; returns [(endpoint, seconds, queries, ok)]."""
+        results = []
+        client = Client() if self.options['base_url'] is None else None
+        while self.take():
+            endpoint = rng.choices(self.endpoints, self.weights)[0]
+            method, path, body = self.request_for(endpoint, rng)
+            token = rng.choice(self.tokens)
+            send = self.send_in_process if client else self.send_http
+            results.append((endpoint, *send(client, method, path, body, token)))
+        return results
+
+    def request_for(self, endpoint, rng):
+        if endpoint == 'feed':
+            return 'GET', reverse('user_feed'), None
+        if endpoint == 'notifications':
+            return 'GET', reverse('notification-list'), None
+        post_id = rng.choice(self.post_ids)
+        if endpoint == 'like':
+            return 'POST', reverse('post-like', args=[post_id]), None
+        return 'POST', reverse('post-comments-list', args=[post_id]), {'content': 'Load test comment'}
+
+    def send_in_process(self, client, method, path, body, token):
+        headers = {'Authorization': f'Token {token}'}
+        with recording(QueryStats()) as queries:
+            started = time.perf_counter()
+            if method == 'GET':
+                response = client.get(path, secure=True, headers=headers)
+            else:
+                response = client.post(path, body or {}, content_type='application/json', secure=True,
+                                       headers=headers)
+            seconds = time.perf_counter() - started
+        return seconds, queries.count, response.status_code < 400
+
+    def send_http(self, client, method, path, body, token):
+        data = json.dumps(body).encode() if body is not None else None
+        request = urllib.request.Request(self.options['base_url'].rstrip('/') + path, data=data, method=method,
+                                         headers={'Authorization': f'Token {token}',
+                                                  'Content-Type': 'application/json'})
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=self.options['timeout']) as response:
+                response.read()
+                # Sent by QueryBudgetMiddleware when QUERY_BUDGET_HEADERS is on
+                queries = response.headers.get('X-Query-Count')
+                ok = True
+        except (urllib.error.URLError, OSError):
+            queries, ok = None, False
+        return time.perf_counter() - started, None if queries is None else int(queries), ok
+
+    def report(self, results, elapsed):
+        by_endpoint = defaultdict(list)
+        for endpoint, seconds, queries, ok in results:
+            by_endpoint[endpoint].append((seconds, queries, ok))
+
+        self.stdout.write(f'{len(results)} requests in {elapsed:.1f}s ({len(results) / elapsed:.1f} req/s), '
+                          f'concurrency {self.options["concurrency"]}')
+        self.stdout.write(f'{"endpoint":<14}{"count":>7}{"errors":>8}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}'
+                          f'{"queries":>9}')
+        for endpoint in ENDPOINTS:
+            rows = by_endpoint.get(endpoint)
+            if not rows:
+                continue
+            latencies = sorted(seconds * 1000 for seconds, _, _ in rows)
+            counts = [queries for _, queries, _ in rows if queries is not None]
+            queries = f'{sum(counts) / len(counts):.1f}' if counts else '-'
+            errors = sum(1 for _, _, ok in rows if not ok)
+            self.stdout.write(f'{endpoint:<14}{len(rows):>7}{errors:>8}{percentile(latencies, 0.50):>9.1f}'
+                              f'{percentile(latencies, 0.95):>9.1f}{percentile(latencies, 0.99):>9.1f}{queries:>9}')
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from posts.models import Post
+from posts.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Re-index every post in the configured full-text search backend.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        batch_size = options['batch_size']
+        indexed = 0
+        last_id = 0
+        while True:
+            posts = list(Post.objects.filter(id__gt=last_id).order_by('id')
+                         .only('id', 'title', 'content')[:batch_size])
+            if not posts:
+                break
+            backend.index(posts)
+            indexed += len(posts)
+            last_id = posts[-1].id
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} post(s) with {type(backend).__name__}.'))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+from posts.timeline import rebuild_timeline
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the materialized home timelines from the follow graph.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids',
+                            help='Only rebuild the timeline of this user id (repeatable).')
+        parser.add_argument('--limit', type=int, default=None,
+                            help='Maximum number of posts copied per followed author.')
+
+    def handle(self, *args, **options):
+        users = User.objects.all()
+        if options['user_ids']:
+            users = users.filter(id__in=options['user_ids'])
+
+        rebuilt = 0
+        for user in users.iterator():
+            rebuild_timeline(user, limit=options['limit'])
+            rebuilt += 1
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rebuilt} timeline(s).'))
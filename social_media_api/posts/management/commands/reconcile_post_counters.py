@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, OuterRef, Q, Subquery, Value, F
+from django.db.models.functions import Coalesce
+from posts.models import Post, Like, Comment
+
+
+def count_of(model):
+    counts = (model.objects.filter(post=OuterRef('pk')).order_by()
+              .values('post').annotate(total=Count('pk')).values('total'))
+    return Coalesce(Subquery(counts), Value(0))
+
+
+class Command(BaseCommand):
+    help = 'Repair drift between the stored post counters and the Like/Comment tables.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Number of posts checked per transaction.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        repaired = 0
+        last_id = 0
+        while True:
+            ids = list(Post.objects.filter(id__gt=last_id).order_by('id')
+                       .values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            last_id = ids[-1]
+
+            with transaction.atomic():
+                drifted = (Post.objects.filter(id__in=ids)
+                           .annotate(real_likes=count_of(Like), real_comments=count_of(Comment))
+                           .filter(~Q(likes_count=F('real_likes')) | ~Q(comments_count=F('real_comments')))
+                           .values_list('id', flat=True))
+                drifted = list(drifted)
+                if drifted:
+                    repaired += Post.objects.filter(id__in=drifted).update(
+                        likes_count=count_of(Like), comments_count=count_of(Comment))
+
+        self.stdout.write(self.style.SUCCESS(f'Repaired counters on {repaired} post(s).'))
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.4 on 2026-10-18 18:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.utils import OperationalError
+
+
+def create_native_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'mysql':
+        schema_editor.execute('ALTER TABLE posts_post ADD FULLTEXT INDEX posts_post_fulltext (title, content)')
+    elif vendor == 'sqlite':
+        try:
+            schema_editor.execute('CREATE VIRTUAL TABLE posts_post_fts USING fts5(title, content)')
+        except OperationalError:
+            # SQLite built without FTS5: posts.search falls back to the inverted index
+            return
+        schema_editor.execute('INSERT INTO posts_post_fts(rowid, title, content) SELECT id, title, content FROM posts_post')
+
+
+def drop_native_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'mysql':
+        schema_editor.execute('ALTER TABLE posts_post DROP INDEX posts_post_fulltext')
+    elif vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS posts_post_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0004_post_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('weight', models.PositiveIntegerField(default=1)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='posts.post')),
+            ],
+            options={
+                'unique_together': {('term', 'post')},
+            },
+        ),
+        migrations.RunPython(create_native_index, drop_native_index),
+    ]
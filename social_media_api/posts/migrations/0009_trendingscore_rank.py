@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 18:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_trendingscore'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trendingscore',
+            name='rank',
+            field=models.PositiveIntegerField(blank=True, db_index=True, null=True),
+        ),
+    ]
@@ -10,6 +10,15 @@ class Post(models.Model):
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Denormalized counters, kept in step with F() updates by the like/comment views
+    likes_count = models.PositiveIntegerField(default=0)
+    comments_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['author', '-created_at'], name='post_author_recent_idx'),
+            models.Index(fields=['-created_at', '-id'], name='post_recent_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -21,6 +30,13 @@ class Comment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['post', '-created_at'], name='comment_post_recent_idx'),
+            # Covers the max(updated_at)/count probe behind the comment list's ETag
+            models.Index(fields=['post', 'updated_at'], name='comment_post_updated_idx'),
+        ]
+
     def __str__(self):
         return f'Comment by {self.author.username} on {self.post.title}'
 
@@ -32,6 +48,55 @@ class Like(models.Model):
     class Meta:
         unique_together = ('user', 'post')
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['post', '-created_at'], name='like_post_recent_idx'),
+        ]
 
     def __str__(self):
         return f'{self.user.username} likes {self.post}'
+
+class TimelineEntry(models.Model):
+    # Materialized home timeline: one row per (follower, post), written when the post is created
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='timeline_entries')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='timeline_entries')
+    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    created_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('user', 'post')
+        ordering = ['-created_at', '-post']
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-post'], name='timeline_user_recent_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.post} in timeline of {self.user.username}'
+
+class SearchTerm(models.Model):
+    # Inverted index used by posts.search.InvertedIndexBackend when the database has no full-text index
+    term = models.CharField(max_length=64)
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='search_terms')
+    weight = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        unique_together = ('term', 'post')
+
+    def __str__(self):
+        return f'{self.term} in {self.post_id}'
+
+class TrendingScore(models.Model):
+    """
+    Time-decayed engagement of a post, maintained by posts.trending.
+
+    `score` is stored "forward decayed" relative to `base` (a Unix timestamp): its value
+    at time t is score * 2 ** ((base - t) / half_life), so new engagement is a plain
+    increment and no row has to be touched as time passes. `rank` is the post's place in
+    the top-K list published by the last compaction, NULL outside it.
+    """
+    post = models.OneToOneField(Post, on_delete=models.CASCADE, primary_key=True, related_name='trending_score')
+    score = models.FloatField(default=0)
+    base = models.FloatField()
+    rank = models.PositiveIntegerField(null=True, blank=True, db_index=True)
+
+    def __str__(self):
+        return f'{self.post_id}: {self.score}'
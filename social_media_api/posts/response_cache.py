@@ -0,0 +1,118 @@
+import hashlib
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import Http404
+from rest_framework.response import Response
+
+from social_media_api.conditional import conditional_response
+
+from .models import Comment, Post
+
+# Bump when PostSerializer/CommentSerializer output changes, so old entries are never served
+REPRESENTATION_VERSION = 1
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _cache():
+    alias = _setting('POSTS_RESPONSE_CACHE', None)
+    return None if alias is None else caches[alias]
+
+
+def is_process_local(alias):
+    # Invalidations made by one worker would never reach the entries of the others
+    return caches[alias].__class__.__name__ in ('LocMemCache', 'DummyCache')
+
+
+def _generation(cache, post_id):
+    # Random rather than a counter: an evicted generation must never come back with an old value
+    key = f'post-response-gen:{post_id}'
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        generation = cache.get(key)
+    return generation
+
+
+def _bump(post_ids):
+    if _cache() is None:
+        return
+    _cache().set_many({f'post-response-gen:{post_id}': uuid.uuid4().hex for post_id in post_ids}, None)
+
+
+def invalidate_posts(post_ids):
+    """Drop every cached detail and comment-list response of these posts."""
+    post_ids = set(post_ids)
+    if not post_ids:
+        return
+    _bump(post_ids)
+    # Again after commit, in case a reader cached the pre-commit rows in between
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: _bump(post_ids))
+
+
+def invalidate_author(user_id):
+    """Drop the cached responses that embed this user's profile: their posts and the comment lists they are in."""
+    if _cache() is None:
+        return
+    authored = Post.objects.filter(author=user_id).values_list('id', flat=True)
+    commented = Comment.objects.filter(author=user_id).values_list('post_id', flat=True)
+    invalidate_posts(authored.union(commented))
+
+
+def _single_flight(cache, key, build):
+    """Only one caller rebuilds a missing entry; the others wait for its result."""
+    lock_timeout = _setting('POSTS_RESPONSE_CACHE_LOCK_TIMEOUT', 5)
+    lock = f'{key}:lock'
+    if cache.add(lock, 1, lock_timeout):
+        try:
+            entry = build()
+            cache.set(key, entry, _setting('POSTS_RESPONSE_CACHE_TIMEOUT', 300))
+        finally:
+            cache.delete(lock)
+        return entry
+
+    deadline = time.monotonic() + lock_timeout
+    while time.monotonic() < deadline:
+        time.sleep(0.01)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+        if cache.get(lock) is None:
+            break  # the builder failed; do the work ourselves
+    return build()
+
+
+def cached_response(request, post_id, kind, build):
+    """
+    Serve a post's `kind` representation ('detail', 'comments') from the cache.
+
+    `build()` returns an (etag, data) pair and only runs on a miss. Entries are keyed by
+    post id, REPRESENTATION_VERSION and the post's current generation, plus the variant
+    of the request (format, host and query string, which shape pagination links).
+    Without POSTS_RESPONSE_CACHE every request builds its response, still conditionally.
+    """
+    try:
+        post_id = int(post_id)
+    except (TypeError, ValueError):
+        raise Http404('No Post matches the given query.')
+    cache = _cache()
+    if cache is None:
+        etag, data = build()
+        return conditional_response(request, etag, lambda: Response(data))
+    renderer = getattr(request, 'accepted_renderer', None)
+    variant = repr((getattr(renderer, 'format', None), request.get_host(), request.META.get('QUERY_STRING', '')))
+    variant = hashlib.md5(variant.encode()).hexdigest()
+    key = f'post-response:{REPRESENTATION_VERSION}:{post_id}:{_generation(cache, post_id)}:{kind}:{variant}'
+
+    entry = cache.get(key)
+    if entry is None:
+        entry = _single_flight(cache, key, build)
+    etag, data = entry
+    return conditional_response(request, etag, lambda: Response(data))
@@ -0,0 +1,142 @@
+import re
+from collections import Counter
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, Count, IntegerField, Sum, Value, When
+from django.utils.module_loading import import_string
+from rest_framework.filters import BaseFilterBackend
+
+from .models import Post, SearchTerm
+
+TOKEN_RE = re.compile(r'\w+')
+MAX_RESULTS = getattr(settings, 'POSTS_SEARCH_MAX_RESULTS', 1000)
+
+
+def tokenize(text):
+    return [token[:64] for token in TOKEN_RE.findall(text.lower()) if len(token) > 1]
+
+
+class InvertedIndexBackend:
+    """Portable fallback: a (term, post, weight) table maintained by the application."""
+    title_weight = 3
+    batch_size = 1000
+
+    def index(self, posts):
+        posts = list(posts)
+        SearchTerm.objects.filter(post__in=[post.id for post in posts]).delete()
+        rows = []
+        for post in posts:
+            weights = Counter()
+            for token in tokenize(post.title):
+                weights[token] += self.title_weight
+            for token in tokenize(post.content):
+                weights[token] += 1
+            rows += [SearchTerm(term=term, post_id=post.id, weight=weight) for term, weight in weights.items()]
+        SearchTerm.objects.bulk_create(rows, batch_size=self.batch_size)
+
+    def remove(self, post_ids):
+        SearchTerm.objects.filter(post_id__in=post_ids).delete()
+
+    def search(self, query, limit=MAX_RESULTS):
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+        # Every term has to match; posts are ranked by their summed term weights
+        ranked = (SearchTerm.objects.filter(term__in=terms)
+                  .values('post_id')
+                  .annotate(matched=Count('id'), score=Sum('weight'))
+                  .filter(matched=len(terms))
+                  .order_by('-score', '-post_id')
+                  .values_list('post_id', flat=True))
+        return list(ranked[:limit])
+
+
+class SQLiteFTS5Backend:
+    """SQLite FTS5 virtual table keyed by the post id and ranked with bm25()."""
+    table = 'posts_post_fts'
+
+    def index(self, posts):
+        posts = list(posts)
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {self.table} WHERE rowid = %s', [(post.id,) for post in posts])
+            cursor.executemany(f'INSERT INTO {self.table}(rowid, title, content) VALUES (%s, %s, %s)',
+                               [(post.id, post.title, post.content) for post in posts])
+
+    def remove(self, post_ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {self.table} WHERE rowid = %s', [(pk,) for pk in post_ids])
+
+    def search(self, query, limit=MAX_RESULTS):
+        terms = tokenize(query)
+        if not terms:
+            return []
+        match = ' '.join(f'"{term}"' for term in terms)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s '
+                f'ORDER BY bm25({self.table}, 3.0, 1.0), rowid DESC LIMIT %s',
+                [match, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class MySQLFulltextBackend:
+    """MySQL FULLTEXT index on posts_post(title, content); InnoDB keeps it in sync itself."""
+
+    def index(self, posts):
+        pass
+
+    def remove(self, post_ids):
+        pass
+
+    def search(self, query, limit=MAX_RESULTS):
+        terms = tokenize(query)
+        if not terms:
+            return []
+        match = ' '.join(f'+{term}' for term in terms)
+        table = Post._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT id FROM {table} WHERE MATCH(title, content) AGAINST (%s IN BOOLEAN MODE) '
+                f'ORDER BY MATCH(title, content) AGAINST (%s IN BOOLEAN MODE) DESC, id DESC LIMIT %s',
+                [match, match, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+@lru_cache(maxsize=None)
+def _load_backend(path, vendor):
+    if path != 'auto':
+        return import_string(path)()
+    if vendor == 'mysql':
+        return MySQLFulltextBackend()
+    if vendor == 'sqlite' and SQLiteFTS5Backend.table in connection.introspection.table_names():
+        return SQLiteFTS5Backend()
+    return InvertedIndexBackend()
+
+
+def get_search_backend():
+    """Backend named by POSTS_SEARCH_BACKEND, or the best one the database supports ('auto')."""
+    return _load_backend(getattr(settings, 'POSTS_SEARCH_BACKEND', 'auto'), connection.vendor)
+
+
+class PostSearchFilter(BaseFilterBackend):
+    """Drop-in replacement for SearchFilter on posts, backed by the full-text index."""
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query:
+            return queryset
+
+        post_ids = get_search_backend().search(query, MAX_RESULTS)
+        if not post_ids:
+            return queryset.none()
+
+        rank = Case(*[When(id=pk, then=Value(position)) for position, pk in enumerate(post_ids)],
+                    output_field=IntegerField())
+        # Paginate in relevance order rather than by recency
+        view.cursor_ordering = ('search_rank', 'id')
+        return queryset.filter(id__in=post_ids).annotate(search_rank=rank).order_by('search_rank')
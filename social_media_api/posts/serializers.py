@@ -1,28 +1,37 @@
 from rest_framework import serializers
 from .models import Post, Comment, Like
-from accounts.serializers import UserSerializer
+from accounts.serializers import UserSerializer, profile_version
+from social_media_api.dynamic_fields import DynamicFieldsMixin
+from social_media_api.eager_loading import EagerLoadingMixin
 
-class PostSerializer(serializers.ModelSerializer):
+class PostSerializer(DynamicFieldsMixin, EagerLoadingMixin, serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
-    likes_count = serializers.SerializerMethodField()
-    comments_count = serializers.SerializerMethodField()
 
     class Meta:
         model = Post
         fields = ['id', 'author', 'content', 'created_at', 'likes_count', 'comments_count']
-        read_only_fields = ['author', 'created_at']
-
-    def get_likes_count(self, obj):
-        return obj.likes.count()
+        read_only_fields = ['author', 'created_at', 'likes_count', 'comments_count']
 
-    def get_comments_count(self, obj):
-        return obj.comments.count()
+def post_version(post):
+    # updated_at covers edits; the counters and the embedded author change without touching it
+    return (post.pk, post.updated_at, post.likes_count, post.comments_count, *profile_version(post.author))
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(DynamicFieldsMixin, EagerLoadingMixin, serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
     post = serializers.PrimaryKeyRelatedField(read_only=True)
+    # ?expand=post embeds the post instead of its id
+    expandable_fields = {'post': lambda: PostSerializer(read_only=True)}
 
     class Meta:
         model = Comment
         fields = ['id', 'author', 'post', 'content', 'created_at']
         read_only_fields = ['author', 'created_at']
+
+class BulkLikeSerializer(serializers.Serializer):
+    like = serializers.ListField(child=serializers.IntegerField(min_value=1), max_length=500, required=False, default=list)
+    unlike = serializers.ListField(child=serializers.IntegerField(min_value=1), max_length=500, required=False, default=list)
+
+    def validate(self, attrs):
+        if set(attrs['like']) & set(attrs['unlike']):
+            raise serializers.ValidationError('A post cannot be liked and unliked in the same request.')
+        return attrs
@@ -0,0 +1,36 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Comment, Post
+from .response_cache import invalidate_author, invalidate_posts
+from .search import get_search_backend
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, **kwargs):
+    get_search_backend().index([instance])
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    get_search_backend().remove([instance.pk])
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_responses(sender, instance, **kwargs):
+    invalidate_posts([instance.pk])
+
+
+# Likes are invalidated by posts.likes itself; receivers here would stop their fast deletes
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_parent_post_responses(sender, instance, **kwargs):
+    invalidate_posts([instance.post_id])
+
+
+@receiver(post_save, sender=get_user_model())
+def invalidate_profile_responses(sender, instance, created, update_fields, **kwargs):
+    # Logins only stamp last_login, which no post or comment renders
+    if not created and update_fields != frozenset({'last_login'}):
+        invalidate_author(instance.pk)
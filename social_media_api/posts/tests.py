@@ -1,3 +1,715 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+import threading
+import time
+from base64 import urlsafe_b64encode
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework import status
+from accounts.graph import Follow, follower_ids
+from notifications.models import Notification, UnreadCounter
+from rest_framework.exceptions import ParseError
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+from social_media_api import fast_json
+from social_media_api.authentication import token_cache
+from social_media_api.fast_json import FastJSONParser, FastJSONRenderer
+from social_media_api.query_budget import query_budget
+from social_media_api.throttling import local_buckets
+from . import trending
+from .models import Comment, Post, Like, SearchTerm, TimelineEntry, TrendingScore
+from .bulk_import import import_posts
+from .checks import check_response_cache
+from .likes import bulk_like, like, unlike
+from .response_cache import _single_flight
+from .timeline import fan_out_post
+from .views import CommentViewSet, PostViewSet
 
-# Create your tests here.
+User = get_user_model()
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class UserFeedTests(APITestCase):
+    def setUp(self):
+        self.reader = User.objects.create_user(username='reader', password='pass12345')
+        self.writer = User.objects.create_user(username='writer', password='pass12345')
+        self.client.force_authenticate(self.reader)
+        cache.clear()
+
+    def feed_ids(self):
+        response = self.client.get(reverse('user_feed'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [post['id'] for post in response.data['results']]
+
+    def test_new_post_is_fanned_out_to_followers(self):
+        self.reader.following.add(self.writer)
+        self.client.force_authenticate(self.writer)
+        response = self.client.post(reverse('post-list'), {'content': 'hello'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        self.client.force_authenticate(self.reader)
+        self.assertEqual(self.feed_ids(), [response.data['id']])
+
+    def test_fan_out_ignores_a_stale_follow_graph_cache(self):
+        follower_ids(self.writer.id)  # cached empty in this process
+        Follow.objects.create(from_user=self.writer, to_user=self.reader)  # followed through another worker
+        fan_out_post(Post.objects.create(author=self.writer, title='a', content='a'))
+        self.assertEqual(len(self.feed_ids()), 1)
+
+    def test_follow_backfills_and_unfollow_trims(self):
+        older = Post.objects.create(author=self.writer, title='a', content='a')
+        newer = Post.objects.create(author=self.writer, title='b', content='b')
+
+        self.client.post(reverse('follow_user', args=[self.writer.id]))
+        self.assertEqual(self.feed_ids(), [newer.id, older.id])
+
+        self.client.post(reverse('unfollow_user', args=[self.writer.id]))
+        self.assertEqual(self.feed_ids(), [])
+
+    def test_rebuild_timelines_command(self):
+        self.reader.following.add(self.writer)
+        post = Post.objects.create(author=self.writer, title='a', content='a')
+        TimelineEntry.objects.all().delete()
+
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.assertEqual(self.feed_ids(), [post.id])
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class KeysetPaginationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader', password='pass12345')
+        self.client.force_authenticate(self.user)
+        self.posts = [Post.objects.create(author=self.user, title=str(i), content=str(i)) for i in range(5)]
+
+    def test_walks_pages_without_offset_and_ignores_new_posts(self):
+        response = self.client.get(reverse('post-list'), {'page_size': 2})
+        self.assertNotIn('count', response.data)
+        seen = [post['id'] for post in response.data['results']]
+
+        # A post arriving mid-scroll must not shift the following pages
+        Post.objects.create(author=self.user, title='new', content='new')
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            seen += [post['id'] for post in response.data['results']]
+
+        self.assertEqual(seen, [post.id for post in reversed(self.posts)])
+
+    def test_previous_link_returns_the_earlier_page(self):
+        first = self.client.get(reverse('post-list'), {'page_size': 2})
+        second = self.client.get(first.data['next'])
+        back = self.client.get(second.data['previous'])
+        self.assertEqual(back.data['results'], first.data['results'])
+        self.assertIsNone(back.data['previous'])
+
+    def test_optional_count_and_page_number_fallback(self):
+        response = self.client.get(reverse('post-list'), {'count': 'true'})
+        self.assertEqual(response.data['count'], 5)
+
+        response = self.client.get(reverse('post-list'), {'page': 1})
+        self.assertEqual(response.data['count'], 5)
+        self.assertEqual(len(response.data['results']), 5)
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get(reverse('post-list'), {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        # Well-formed JSON whose positions are not scalars must not reach the query
+        for position in ([{}, 1], [[1], 1], ['2020-01-01T00:00:00', {}]):
+            token = urlsafe_b64encode(json.dumps({'p': position}).encode()).decode()
+            response = self.client.get(reverse('post-list'), {'cursor': token})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class PostCounterTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader', password='pass12345')
+        self.author = User.objects.create_user(username='writer', password='pass12345')
+        self.post = Post.objects.create(author=self.author, title='t', content='c')
+        self.client.force_authenticate(self.user)
+
+    def test_like_and_comment_views_keep_counters_in_step(self):
+        self.client.post(reverse('post-like', args=[self.post.id]))
+        response = self.client.post(reverse('post-comments-list', args=[self.post.id]), {'content': 'hi'})
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.likes_count, self.post.comments_count), (1, 1))
+
+        self.client.post(reverse('post-unlike', args=[self.post.id]))
+        self.client.delete(reverse('post-comments-detail', args=[self.post.id, response.data['id']]))
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.likes_count, self.post.comments_count), (0, 0))
+
+    def test_concurrent_comment_delete_counts_once(self):
+        comment = Comment.objects.create(post=self.post, author=self.user, content='hi')
+        Post.objects.filter(pk=self.post.pk).update(comments_count=1)
+        stale = Comment.objects.get(pk=comment.pk)
+        self.client.delete(reverse('post-comments-detail', args=[self.post.id, comment.id]))
+        # The second request fetched the comment before the first one deleted it
+        with mock.patch.object(CommentViewSet, 'get_object', return_value=stale):
+            response = self.client.delete(reverse('post-comments-detail', args=[self.post.id, comment.id]))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 0)
+
+    def test_reconcile_command_repairs_drift(self):
+        Like.objects.create(user=self.user, post=self.post)
+        Post.objects.filter(pk=self.post.pk).update(comments_count=7)
+
+        call_command('reconcile_post_counters', stdout=StringIO())
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.likes_count, self.post.comments_count), (1, 0))
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class PostQueryPlanTests(APITestCase):
+    def setUp(self):
+        self.reader = User.objects.create_user(username='reader', password='pass12345')
+        for i in range(12):
+            author = User.objects.create_user(username=f'author{i}')
+            author.followers.add(self.reader)
+            post = Post.objects.create(author=author, title=str(i), content=str(i))
+            TimelineEntry.objects.create(user=self.reader, post=post, author=author, created_at=post.created_at)
+        self.client.force_authenticate(self.reader)
+
+    def assertConstantQueries(self, url, expected):
+        for page_size in (1, 5, 12):
+            with self.assertNumQueries(expected):
+                response = self.client.get(url, {'page_size': page_size})
+            self.assertEqual(len(response.data['results']), page_size)
+
+    def test_post_list_query_count_is_independent_of_page_size(self):
+        # posts joined with their authors, nothing per row
+        self.assertConstantQueries(reverse('post-list'), 1)
+
+    def test_feed_query_count_is_independent_of_page_size(self):
+        self.assertConstantQueries(reverse('user_feed'), 1)
+
+    def test_hot_queries_use_indexes(self):
+        out = StringIO()
+        call_command('explain_hot_queries', stdout=out)
+        self.assertNotIn('FULL SCAN', out.getvalue())
+        self.assertNotIn('SORT', out.getvalue())
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class PostSearchTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader')
+        self.client.force_authenticate(self.user)
+
+    def search_ids(self, query):
+        response = self.client.get(reverse('post-list'), {'search': query})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [post['id'] for post in response.data['results']]
+
+    def check_backend(self):
+        in_content = Post.objects.create(author=self.user, title='Weekend', content='Cooking pasta tonight')
+        in_title = Post.objects.create(author=self.user, title='Pasta recipes', content='Cooking for friends')
+        Post.objects.create(author=self.user, title='Unrelated', content='Nothing here')
+
+        self.assertEqual(self.search_ids('pasta cooking'), [in_title.id, in_content.id])
+
+        in_content.content = 'Grilling tonight'
+        in_content.save()
+        self.assertEqual(self.search_ids('pasta'), [in_title.id])
+
+        in_title.delete()
+        self.assertEqual(self.search_ids('pasta'), [])
+
+    def test_native_backend(self):
+        self.check_backend()
+
+    @override_settings(POSTS_SEARCH_BACKEND='posts.search.InvertedIndexBackend')
+    def test_inverted_index_backend(self):
+        self.check_backend()
+
+    @override_settings(POSTS_SEARCH_BACKEND='posts.search.InvertedIndexBackend')
+    def test_benchmark_cleans_up_in_bulk(self):
+        with mock.patch('posts.signals.invalidate_posts') as invalidate:
+            call_command('benchmark_search', '--posts', '30', '--queries', '2', '--vocabulary', '100',
+                         '--batch-size', '20', stdout=StringIO())
+        invalidate.assert_not_called()  # no per-row post_delete receivers
+        self.assertFalse(Post.objects.exists())
+        self.assertFalse(SearchTerm.objects.exists())
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, NOTIFICATIONS_DISPATCH_MODE='sync')
+class LikeTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader')
+        self.author = User.objects.create_user(username='writer')
+        self.posts = [Post.objects.create(author=self.author, title=str(i), content=str(i)) for i in range(3)]
+        self.client.force_authenticate(self.user)
+
+    def likes_count(self, post):
+        post.refresh_from_db()
+        return post.likes_count
+
+    def test_like_and_unlike_are_idempotent(self):
+        post = self.posts[0]
+        url = reverse('post-like', args=[post.id])
+        self.assertEqual(self.client.post(url).status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.client.post(url).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.likes_count(post), 1)
+        self.assertEqual(self.author.notifications.count(), 1)
+
+        url = reverse('post-unlike', args=[post.id])
+        self.assertEqual(self.client.post(url).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.post(url).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.likes_count(post), 0)
+
+    def test_liking_a_missing_post_is_404(self):
+        self.assertEqual(self.client.post(reverse('post-like', args=[999])).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.post(reverse('post-unlike', args=[999])).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_bulk_like_counts_only_its_own_inserts(self):
+        first, second, _ = self.posts
+        like(self.user, first.id)
+        # A concurrent request liked the first post after this one checked for existing likes
+        with mock.patch.object(Like.objects, 'filter', return_value=Like.objects.none()):
+            authors = bulk_like(self.user, [first.id, second.id])
+        self.assertEqual(authors, {second.id: self.author.id})
+        self.assertEqual([self.likes_count(post) for post in (first, second)], [1, 1])
+
+    def test_unlike_is_a_single_delete(self):
+        like(self.user, self.posts[0].id)
+        with CaptureQueriesContext(connection) as queries:
+            unlike(self.user, self.posts[0].id)
+        like_queries = [query['sql'] for query in queries if 'posts_like' in query['sql']]
+        self.assertEqual(len(like_queries), 1)
+        self.assertTrue(like_queries[0].startswith('DELETE'))
+
+    def test_bulk_like_and_unlike(self):
+        first, second, third = self.posts
+        Like.objects.create(user=self.user, post=third)
+        Post.objects.filter(pk=third.pk).update(likes_count=1)
+
+        response = self.client.post(reverse('post-bulk-like'),
+                                    {'like': [first.id, second.id, first.id, 999], 'unlike': [third.id]},
+                                    format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'liked': [first.id, second.id], 'unliked': [third.id]})
+        self.assertEqual([self.likes_count(post) for post in self.posts], [1, 1, 0])
+
+        response = self.client.post(reverse('post-bulk-like'), {'like': [first.id]}, format='json')
+        self.assertEqual(response.data['liked'], [])
+        self.assertEqual(self.likes_count(first), 1)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class ConditionalGetTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader')
+        self.post = Post.objects.create(author=self.user, title='t', content='c')
+        self.client.force_authenticate(self.user)
+        cache.clear()
+
+    def assertRevalidates(self, url, change):
+        response = self.client.get(url)
+        etag = response['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+
+        change()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_post_detail(self):
+        self.assertRevalidates(reverse('post-detail', args=[self.post.id]),
+                               lambda: self.client.post(reverse('post-like', args=[self.post.id])))
+
+    def test_comment_list(self):
+        url = reverse('post-comments-list', args=[self.post.id])
+        self.assertRevalidates(url, lambda: self.client.post(url, {'content': 'first'}))
+
+    def test_comment_list_follows_its_authors_profiles(self):
+        Comment.objects.create(post=self.post, author=self.user, content='hi')
+        url = reverse('post-comments-list', args=[self.post.id])
+        self.assertRevalidates(url, lambda: User.objects.filter(pk=self.user.pk).update(username='renamed'))
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, POSTS_RESPONSE_CACHE='default')
+class PostResponseCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='reader')
+        self.post = Post.objects.create(author=self.user, title='t', content='c')
+        self.client.force_authenticate(self.user)
+
+    def test_hot_post_is_served_without_queries_until_it_changes(self):
+        url = reverse('post-detail', args=[self.post.id])
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).data['likes_count'], 0)
+
+        self.client.post(reverse('post-like', args=[self.post.id]))
+        self.assertEqual(self.client.get(url).data['likes_count'], 1)
+        self.client.post(reverse('post-unlike', args=[self.post.id]))
+        self.assertEqual(self.client.get(url).data['likes_count'], 0)
+
+        Post.objects.get(pk=self.post.pk).delete()
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_comment_list_is_invalidated_by_comment_changes(self):
+        url = reverse('post-comments-list', args=[self.post.id])
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).data['results'], [])
+
+        comment = Comment.objects.create(post=self.post, author=self.user, content='hi')
+        self.assertEqual(len(self.client.get(url).data['results']), 1)
+        comment.delete()
+        self.assertEqual(self.client.get(url).data['results'], [])
+
+    def test_concurrent_misses_wait_for_a_single_rebuild(self):
+        key = 'post-response:test'
+        cache.add(f'{key}:lock', 1)
+        threading.Timer(0.05, cache.set, args=(key, ('"etag"', {'id': 1}))).start()
+
+        def build():
+            raise AssertionError('a second caller rebuilt the entry')
+
+        self.assertEqual(_single_flight(cache, key, build), ('"etag"', {'id': 1}))
+
+    def test_profile_edits_retire_entries_that_embed_the_author(self):
+        commenter = User.objects.create_user(username='commenter')
+        Comment.objects.create(post=self.post, author=commenter, content='hi')
+        detail = reverse('post-detail', args=[self.post.id])
+        comments = reverse('post-comments-list', args=[self.post.id])
+        self.client.get(detail), self.client.get(comments)
+
+        self.user.username = 'renamed'
+        self.user.save()
+        commenter.bio = 'new bio'
+        commenter.save()
+        self.assertEqual(self.client.get(detail).data['author']['username'], 'renamed')
+        self.assertEqual(self.client.get(comments).data['results'][0]['author']['bio'], 'new bio')
+
+    def test_process_local_cache_fails_the_system_check(self):
+        self.assertEqual([error.id for error in check_response_cache(None)], ['posts.E001'])
+        with override_settings(POSTS_RESPONSE_CACHE=None):
+            self.assertEqual(check_response_cache(None), [])
+
+    @override_settings(POSTS_RESPONSE_CACHE=None)
+    def test_disabled_cache_builds_every_response(self):
+        url = reverse('post-detail', args=[self.post.id])
+        etag = self.client.get(url)['ETag']
+        Post.objects.filter(pk=self.post.pk).update(content='edited', updated_at=timezone.now())
+        self.assertEqual(self.client.get(url).data['content'], 'edited')
+        self.assertNotEqual(self.client.get(url)['ETag'], etag)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, TRENDING_HALF_LIFE=3600, NOTIFICATIONS_DISPATCH_MODE='sync')
+class TrendingTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='reader')
+        self.old, self.new = [Post.objects.create(author=self.user, title=t, content=t) for t in ('old', 'new')]
+        self.client.force_authenticate(self.user)
+
+    def test_scores_decay_with_the_half_life(self):
+        now = time.time()
+        trending.record({self.old.id: 4}, now=now - 7200)  # two half-lives ago: worth 1 now
+        trending.record({self.new.id: 2}, now=now)
+        top = trending.top_posts(now=now)
+        self.assertEqual([post_id for post_id, _ in top], [self.new.id, self.old.id])
+        self.assertAlmostEqual(top[1][1], 1.0)
+
+        trending.compact(now=now + 3600 * 10)
+        self.assertFalse(TrendingScore.objects.exists())
+
+    def test_likes_and_comments_feed_the_trending_endpoint(self):
+        self.client.post(reverse('post-like', args=[self.old.id]))
+        self.client.post(reverse('post-comments-list', args=[self.new.id]), {'content': 'hi'})
+        with self.assertNumQueries(3):  # nothing ranked yet: the scores are ranked on the spot
+            response = self.client.get(reverse('post-trending'))
+        self.assertEqual([post['id'] for post in response.data], [self.new.id, self.old.id])
+
+        call_command('compact_trending', stdout=StringIO())
+        cache.clear()  # the ranking lives in the database, where every worker sees it
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('post-trending'))
+        self.assertEqual([post['id'] for post in response.data], [self.new.id, self.old.id])
+        self.assertEqual(list(TrendingScore.objects.order_by('rank').values_list('post_id', 'rank')),
+                         [(self.new.id, 1), (self.old.id, 2)])
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, POSTS_IMPORT_BATCH_SIZE=2)
+class BulkImportTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='importer')
+        self.client.force_authenticate(self.user)
+
+    def test_json_array_reports_bad_rows_and_keeps_the_rest(self):
+        rows = [{'title': 'a', 'content': 'first'}, {'title': 'b'}, {'content': 'third'}, 'nope']
+        response = self.client.post(reverse('post-bulk-create'), rows, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual([error['row'] for error in response.data['errors']], [2, 4])
+        self.assertEqual(set(Post.objects.values_list('content', flat=True)), {'first', 'third'})
+        self.assertEqual(set(Post.objects.values_list('author', flat=True)), {self.user.id})
+
+    def test_ndjson_body(self):
+        body = '{"content": "uno"}\n\n{"content": \n{"content": "tres"}\n'
+        response = self.client.post(reverse('post-bulk-create'), body, content_type='application/x-ndjson')
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual([error['row'] for error in response.data['errors']], [3])
+        # bulk_create skips post_save, so the importer indexes for search itself
+        response = self.client.get(reverse('post-list'), {'search': 'tres'})
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_imported_posts_reach_followers_feeds(self):
+        follower = User.objects.create_user(username='follower')
+        follower.following.add(self.user)
+        response = self.client.post(reverse('post-bulk-create'), [{'content': 'one'}, {'content': 'two'}],
+                                    format='json')
+        self.client.force_authenticate(follower)
+        feed = self.client.get(reverse('user_feed')).data['results']
+        self.assertEqual({post['content'] for post in feed}, {'one', 'two'})
+        self.assertEqual(response.data['created'], 2)
+
+    def test_ids_are_read_back_where_bulk_insert_returns_none(self):
+        User.objects.create_user(username='follower').following.add(self.user)
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert',
+                               new_callable=mock.PropertyMock, return_value=False):
+            result = import_posts([{'content': 'same'}, {'content': 'same'}, {'content': 'other'}], author=self.user)
+        self.assertEqual(result.created, 3)
+        self.assertEqual(set(TimelineEntry.objects.values_list('post_id', flat=True)),
+                         set(Post.objects.values_list('pk', flat=True)))
+        response = self.client.get(reverse('post-list'), {'search': 'other'})
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_import_posts_command(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.ndjson', delete=False) as handle:
+            handle.write(f'{{"author": {self.user.id}, "content": "x"}}\n{{"author": 999, "content": "y"}}\n'
+                         f'{{"author": {self.user.id}, "content": "z"}}\n')
+        self.addCleanup(os.unlink, handle.name)
+
+        out, err = StringIO(), StringIO()
+        call_command('import_posts', handle.name, '--batch-size', '2', stdout=out, stderr=err)
+        self.assertIn('Imported 2 post(s), 1 row(s) rejected', out.getvalue())
+        self.assertIn(':2:', err.getvalue())
+        self.assertEqual(Post.objects.count(), 2)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class SparseFieldsetTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='reader', bio='long bio')
+        self.post = Post.objects.create(author=self.user, title='t', content='c')
+        TimelineEntry.objects.create(user=self.user, post=self.post, author=self.user, created_at=self.post.created_at)
+        self.client.force_authenticate(self.user)
+
+    def test_unrequested_fields_are_neither_fetched_nor_rendered(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('post-list'), {'fields': 'id,content'})
+        self.assertEqual(response.data['results'], [{'id': self.post.id, 'content': 'c'}])
+        sql = queries[0]['sql']
+        self.assertNotIn('accounts_user', sql)
+        self.assertNotIn('"title"', sql)
+
+    def test_nested_fields(self):
+        response = self.client.get(reverse('post-list'), {'fields': 'id,author.username'})
+        self.assertEqual(response.data['results'], [{'id': self.post.id, 'author': {'username': 'reader'}}])
+
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('user_feed'), {'fields': 'content,author.id'})
+        self.assertEqual(response.data['results'], [{'content': 'c', 'author': {'id': self.user.id}}])
+
+    def test_expand_comment_post(self):
+        Comment.objects.create(post=self.post, author=self.user, content='hi')
+        url = reverse('post-comments-list', args=[self.post.id])
+        response = self.client.get(url, {'fields': 'content,post'})
+        self.assertEqual(response.data['results'], [{'content': 'hi', 'post': self.post.id}])
+
+        with self.assertNumQueries(1):  # comments joined with their posts
+            response = self.client.get(url, {'fields': 'content,post.content', 'expand': 'post'})
+        self.assertEqual(response.data['results'], [{'content': 'hi', 'post': {'content': 'c'}}])
+
+
+class FastJSONTests(SimpleTestCase):
+    data = {
+        'when': datetime(2026, 1, 2, 3, 4, 5, tzinfo=dt_timezone.utc),
+        'price': Decimal('1.50'),
+        'label': gettext_lazy('Posts'),
+        1: 'int key',
+        'text': 'line\u2028separator ✓',
+    }
+
+    def test_matches_the_stdlib_renderer(self):
+        fast = json.loads(FastJSONRenderer().render(self.data))
+        self.assertEqual(fast, json.loads(JSONRenderer().render(self.data)))
+        self.assertIn(b'\\u2028', FastJSONRenderer().render(self.data))
+
+    def test_falls_back_without_orjson(self):
+        with mock.patch.object(fast_json, 'orjson', None):
+            self.assertEqual(FastJSONRenderer().render(self.data), JSONRenderer().render(self.data))
+            self.assertEqual(FastJSONParser().parse(BytesIO(b'{"a": [1, 2]}')), {'a': [1, 2]})
+
+    def test_parser_errors(self):
+        with self.assertRaises(ParseError):
+            FastJSONParser().parse(BytesIO(b'{"a": NaN}'))
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command('benchmark_json', '--iterations', '2', '--page-size', '5', stdout=out)
+        self.assertIn('render', out.getvalue())
+        self.assertNotIn('disagree', out.getvalue())
+
+
+class LoadTestToolTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_generated_dataset_is_consistent(self):
+        call_command('generate_dataset', '--users', '40', '--posts', '3', '--seed', '7', stdout=StringIO())
+        users = User.objects.filter(username__startswith='load')
+        self.assertEqual(users.count(), 40)
+        for user in users:
+            self.assertEqual(user.followers_count, user.followers.count())
+            self.assertEqual(user.following_count, user.following.count())
+            unread = Notification.objects.filter(recipient=user, is_read=False).count()
+            self.assertEqual(UnreadCounter.objects.get(user=user).count, unread)
+        for post in Post.objects.all():
+            self.assertEqual(post.likes_count, post.likes.count())
+            self.assertEqual(post.comments_count, post.comments.count())
+        follower = users.filter(following_count__gt=0).first()
+        followed = follower.following.values_list('id', flat=True)
+        self.assertEqual(TimelineEntry.objects.filter(user=follower).count(),
+                         Post.objects.filter(author__in=followed).count())
+
+    def test_load_driver_reports_each_endpoint(self):
+        call_command('generate_dataset', '--users', '10', '--posts', '2', '--seed', '1', stdout=StringIO())
+        out = StringIO()
+        call_command('load_test', '--requests', '40', '--concurrency', '1', '--seed', '1', stdout=out)
+        lines = {line.split()[0]: line.split() for line in out.getvalue().splitlines()[2:]}
+        self.assertEqual(set(lines), {'feed', 'like', 'comment', 'notifications'})
+        for endpoint, (_, count, errors, p50, p95, p99, queries) in lines.items():
+            self.assertEqual(errors, '0', endpoint)
+            self.assertLessEqual(float(p50), float(p99))
+            self.assertGreater(float(queries), 0)
+
+    def test_load_driver_rejects_unknown_endpoints(self):
+        with self.assertRaises(CommandError):
+            call_command('load_test', '--mix', 'feed=1,search=1', stdout=StringIO())
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class QueryBudgetTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        token_cache.clear()
+        self.reader = User.objects.create_user(username='reader', password='pass12345')
+        for i in range(4):
+            author = User.objects.create_user(username=f'author{i}', password='pass12345')
+            self.reader.following.add(author)
+            for _ in range(3):
+                post = Post.objects.create(author=author, title='Title', content='Content')
+                fan_out_post(post)
+                trending.record_event('like', [post.pk])
+        token = Token.objects.create(user=self.reader)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def test_post_and_feed_views_stay_within_budget(self):
+        post = Post.objects.first()
+        with query_budget():
+            self.client.get(reverse('user_feed'))
+            self.client.get(reverse('post-list'))
+            self.client.get(reverse('post-detail', args=[post.pk]))
+            self.client.get(reverse('post-trending'))
+            created = self.client.post(reverse('post-list'), {'title': 'New', 'content': 'Body'}, format='json')
+            url = reverse('post-detail', args=[created.data['id']])
+            self.client.patch(url, {'title': 'Edited'}, format='json')
+            self.client.delete(url)
+
+    def test_create_with_followers_on_a_cold_cache_stays_within_budget(self):
+        for i in range(3):
+            User.objects.create_user(username=f'fan{i}').following.add(self.reader)
+        cache.clear()
+        token_cache.clear()
+        with query_budget():
+            response = self.client.post(reverse('post-list'), {'title': 'New', 'content': 'Body'}, format='json')
+        self.assertEqual(TimelineEntry.objects.filter(post=response.data['id']).count(), 3)
+
+    def test_exceeding_a_budget_fails(self):
+        with mock.patch.object(PostViewSet, 'query_budget', {'list': 0}):
+            with self.assertRaisesMessage(AssertionError, 'PostViewSet.list ran'), \
+                    self.assertLogs('social_media_api.queries', 'WARNING'):
+                with query_budget():
+                    self.client.get(reverse('post-list'))
+
+    def test_total_and_duplicate_limits(self):
+        with self.assertRaisesMessage(AssertionError, 'repeated queries'):
+            with query_budget(allow_duplicates=False):
+                for post in Post.objects.all()[:2]:
+                    post.author.username
+        with self.assertRaisesMessage(AssertionError, 'expected at most 1'):
+            with query_budget(max_queries=1) as stats:
+                Post.objects.count()
+                User.objects.count()
+        self.assertEqual(stats.count, 2)
+
+    @override_settings(QUERY_BUDGET_HEADERS=True)
+    def test_debug_headers_and_log_line(self):
+        with self.assertLogs('social_media_api.queries', 'INFO') as logs:
+            response = self.client.get(reverse('user_feed'))
+        self.assertLessEqual(int(response['X-Query-Count']), 3)
+        self.assertEqual(response['X-Query-Duplicates'], '0')
+        self.assertIn('view=UserFeedView.get', logs.output[0])
+        self.assertEqual(logs.records[0].query_stats['queries'], int(response['X-Query-Count']))
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class LikeThrottleTests(APITestCase):
+    def setUp(self):
+        local_buckets.clear()
+        self.user = User.objects.create_user(username='liker', password='pass12345')
+        self.post = Post.objects.create(author=self.user, title='Title', content='Content')
+        self.client.force_authenticate(self.user)
+
+    def test_like_and_unlike_share_a_bucket(self):
+        rates = {**settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'], 'like': '2/min'}
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': rates}):
+            self.client.post(reverse('post-like', args=[self.post.pk]))
+            self.client.post(reverse('post-unlike', args=[self.post.pk]))
+            response = self.client.post(reverse('post-like', args=[self.post.pk]))
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', response)
+        self.assertFalse(Like.objects.exists())
+
+    def test_bulk_likes_take_a_token_per_post(self):
+        posts = [Post.objects.create(author=self.user, title='Title', content='Content') for _ in range(3)]
+        rates = {**settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'], 'like': '4/min'}
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': rates}):
+            response = self.client.post(reverse('post-bulk-like'), {'like': [post.pk for post in posts]},
+                                        format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            response = self.client.post(reverse('post-bulk-like'), {'unlike': [posts[0].pk, posts[1].pk]},
+                                        format='json')
+            self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+            response = self.client.post(reverse('post-like', args=[self.post.pk]))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)  # the one token left
+        self.assertEqual(Like.objects.count(), 4)
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command('benchmark_throttle', '--iterations', '500', '--users', '50', '--max-us', '10000', stdout=out)
+        self.assertIn('in-process buckets', out.getvalue())
@@ -0,0 +1,61 @@
+from collections import defaultdict
+
+from django.conf import settings
+from accounts.graph import Follow, User
+from .models import Post, TimelineEntry
+
+# How many recent posts of a newly followed author are copied into the follower's timeline
+BACKFILL_SIZE = getattr(settings, 'TIMELINE_BACKFILL_SIZE', 200)
+BATCH_SIZE = getattr(settings, 'TIMELINE_BATCH_SIZE', 1000)
+
+
+def _write_entries(entries):
+    TimelineEntry.objects.bulk_create(entries, batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+
+def fan_out_post(post):
+    """Push a freshly created post into the timeline of every follower of its author."""
+    fan_out_posts([post])
+
+
+def fan_out_posts(posts):
+    """fan_out_post for many posts at once, with one follower query for all their authors."""
+    by_author = defaultdict(list)
+    for post in posts:
+        by_author[post.author_id].append(post)
+    # Read from the table, not the follow-graph cache: a stale set would write lasting rows.
+    # Follow rows read "from_user is followed by to_user"
+    edges = Follow.objects.filter(from_user_id__in=by_author).values_list('from_user_id', 'to_user_id')
+    batch = []
+    for author_id, follower_id in edges.iterator(chunk_size=BATCH_SIZE):
+        for post in by_author[author_id]:
+            batch.append(TimelineEntry(user_id=follower_id, post_id=post.id,
+                                       author_id=author_id, created_at=post.created_at))
+        if len(batch) >= BATCH_SIZE:
+            _write_entries(batch)
+            batch = []
+    if batch:
+        _write_entries(batch)
+
+
+def backfill_timeline(user, author, limit=None):
+    """Copy the most recent posts of `author` into `user`'s timeline after a follow."""
+    limit = BACKFILL_SIZE if limit is None else limit
+    recent = (Post.objects.filter(author=author)
+              .order_by('-created_at', '-id')
+              .values_list('id', 'created_at')[:limit])
+    _write_entries([
+        TimelineEntry(user_id=user.id, post_id=post_id, author_id=author.id, created_at=created_at)
+        for post_id, created_at in recent
+    ])
+
+
+def trim_timeline(user, author):
+    """Drop every post of `author` from `user`'s timeline after an unfollow."""
+    TimelineEntry.objects.filter(user=user, author=author).delete()
+
+
+def rebuild_timeline(user, limit=None):
+    TimelineEntry.objects.filter(user=user).delete()
+    for author in User.objects.filter(id__in=Follow.objects.filter(to_user=user).values('from_user_id')):
+        backfill_timeline(user, author, limit=limit)
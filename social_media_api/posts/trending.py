@@ -0,0 +1,92 @@
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Power
+from django.utils import timezone
+
+from .models import TrendingScore
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _half_life():
+    return float(_setting('TRENDING_HALF_LIFE', 6 * 3600))
+
+
+def _now():
+    return timezone.now().timestamp()
+
+
+def _growth(since, now):
+    # Weight of an event at `now` relative to an event at `since`
+    return Power(Value(2.0), (Value(now) - since) / Value(_half_life()))
+
+
+def decayed_score(now=None):
+    """Expression for the current value of TrendingScore.score."""
+    return F('score') / _growth(F('base'), _now() if now is None else now)
+
+
+def record(deltas, now=None):
+    """
+    Add engagement to posts: `deltas` maps post id -> weight (see TRENDING_WEIGHTS).
+    Each post costs one UPDATE, or an INSERT the first time it is engaged with.
+    """
+    now = _now() if now is None else now
+    for post_id, weight in deltas.items():
+        updated = TrendingScore.objects.filter(post_id=post_id).update(
+            score=F('score') + Value(float(weight)) * _growth(F('base'), now))
+        if updated:
+            continue
+        try:
+            with transaction.atomic():
+                TrendingScore.objects.create(post_id=post_id, score=weight, base=now)
+        except IntegrityError:
+            # Created concurrently; add on top of it
+            TrendingScore.objects.filter(post_id=post_id).update(
+                score=F('score') + Value(float(weight)) * _growth(F('base'), now))
+
+
+def record_event(kind, post_ids):
+    """Record one `kind` event ('like', 'comment') on each of `post_ids`."""
+    weight = _setting('TRENDING_WEIGHTS', {'like': 1.0, 'comment': 2.0})[kind]
+    record({post_id: weight for post_id in post_ids})
+
+
+def top_posts(size=None, now=None):
+    """The `size` highest current scores as [(post id, score)], read straight from the table."""
+    size = size or _setting('TRENDING_SIZE', 50)
+    ranked = (TrendingScore.objects.annotate(current=decayed_score(now))
+              .order_by('-current', 'post_id').values_list('post_id', 'current')[:size])
+    return list(ranked)
+
+
+def compact(now=None):
+    """
+    Periodic maintenance: drop posts whose score has decayed below TRENDING_MIN_SCORE,
+    rebase the rest on `now` so the stored values stay small, and publish the top-K list
+    that the trending endpoint serves in the `rank` column. Returns the number of rows removed.
+    """
+    now = _now() if now is None else now
+    with transaction.atomic():
+        removed, _ = (TrendingScore.objects.annotate(current=decayed_score(now))
+                      .filter(current__lt=_setting('TRENDING_MIN_SCORE', 0.05)).delete())
+        TrendingScore.objects.update(score=decayed_score(now), base=now, rank=None)
+        ranked = [TrendingScore(post_id=post_id, rank=rank)
+                  for rank, (post_id, _) in enumerate(top_posts(now=now), 1)]
+        TrendingScore.objects.bulk_update(ranked, ['rank'])
+    return removed
+
+
+def get_trending(queryset):
+    """
+    The posts of `queryset` in the top-K list published by the last compact(), best first,
+    in one query. Before the first compaction they are ranked on the spot.
+    """
+    ranked = list(queryset.filter(trending_score__rank__isnull=False).order_by('trending_score__rank'))
+    if ranked:
+        return ranked
+    post_ids = [post_id for post_id, _ in top_posts()]
+    posts = queryset.in_bulk(post_ids)
+    return [posts[post_id] for post_id in post_ids if post_id in posts]
@@ -1,7 +1,8 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework_nested.routers import NestedDefaultRouter
-from .views import PostViewSet, CommentViewSet, UserFeedView, like_post, unlike_post
+from .views import (PostViewSet, CommentViewSet, UserFeedView, like_post, unlike_post, bulk_like_posts,
+                    bulk_create_posts)
 
 router = DefaultRouter()
 router.register(r'posts', PostViewSet, basename='post')
@@ -10,6 +11,8 @@ posts_router = NestedDefaultRouter(router, r'posts', lookup='post')
 posts_router.register(r'comments', CommentViewSet, basename='post-comments')
 
 urlpatterns = [
+    path('posts/likes/bulk/', bulk_like_posts, name='post-bulk-like'),
+    path('posts/bulk/', bulk_create_posts, name='post-bulk-create'),
     path('', include(router.urls)),
     path('', include(posts_router.urls)),
     path('feed/', UserFeedView.as_view(), name='user_feed'),
@@ -2,83 +2,178 @@ from rest_framework import viewsets
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from rest_framework import status
-from .models import Post, Comment, Like
-from .serializers import PostSerializer, CommentSerializer
+from .models import Post, Comment, Like, TimelineEntry
+from .serializers import PostSerializer, CommentSerializer, BulkLikeSerializer, post_version
 from .permissions import IsOwnerOrReadOnly
+from .timeline import fan_out_post
+from .search import PostSearchFilter
+from .response_cache import cached_response
+from .trending import get_trending, record_event
+from .bulk_import import NDJSONParser, import_posts
+from .likes import like, unlike, bulk_like, bulk_unlike
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import filters
 from rest_framework.generics import ListAPIView
 from rest_framework import permissions
-from rest_framework.decorators import api_view, permission_classes
-from notifications.models import Notification
+from rest_framework.decorators import action, api_view, parser_classes, permission_classes, throttle_classes
+from notifications.models import NotificationEvent
+from notifications.dispatch import enqueue
 from django.contrib.contenttypes.models import ContentType
 from django.shortcuts import get_object_or_404
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from social_media_api.conditional import make_etag
+from social_media_api.pagination import KeysetPagination
+from social_media_api.eager_loading import EagerLoadingViewMixin
+from social_media_api.fast_json import FastJSONParser
+from social_media_api.throttling import BucketThrottle
 
-class PostViewSet(viewsets.ModelViewSet):
+class PostViewSet(EagerLoadingViewMixin, viewsets.ModelViewSet):
     queryset = Post.objects.all().order_by('-created_at')
     serializer_class = PostSerializer
     permission_classes = [IsAuthenticated, IsOwnerOrReadOnly]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
-    search_fields = ['title', 'content']
+    pagination_class = KeysetPagination
+    filter_backends = [DjangoFilterBackend, PostSearchFilter]
     filterset_fields = ['author', 'title']
+    # Enforced in tests by social_media_api.query_budget; counts include the token lookup.
+    # create: token, INSERT, search index (2 on SQLite FTS5), followers, one timeline INSERT
+    # per TIMELINE_BATCH_SIZE followers
+    query_budget = {'list': 3, 'retrieve': 3, 'trending': 3, 'create': 6, 'update': 6, 'partial_update': 6,
+                    'destroy': 10}
+
+    def retrieve(self, request, *args, **kwargs):
+        def build():
+            post = self.get_object()
+            return make_etag(request, *post_version(post)), self.get_serializer(post).data
+
+        return cached_response(request, self.kwargs['pk'], 'detail', build)
+
+    @action(detail=False, pagination_class=None)
+    def trending(self, request):
+        # The ranking is precomputed by compact_trending; only the K posts are loaded
+        ranked = get_trending(PostSerializer.setup_eager_loading(Post.objects.all()))
+        return Response(self.get_serializer(ranked, many=True).data)
 
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        post = serializer.save(author=self.request.user)
+        fan_out_post(post)
 
-class CommentViewSet(viewsets.ModelViewSet):
+class CommentViewSet(EagerLoadingViewMixin, viewsets.ModelViewSet):
     # just to satisfy the checker
     queryset = Comment.objects.all()
 
     serializer_class = CommentSerializer
     permission_classes = [IsAuthenticated, IsOwnerOrReadOnly]
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         return self.queryset.filter(post=self.kwargs['post_pk']).order_by('-created_at')
 
+    def list(self, request, *args, **kwargs):
+        def build():
+            # Tag the page itself: it embeds comment authors (and the post with ?expand=post),
+            # which change without touching the comments
+            data = super(CommentViewSet, self).list(request, *args, **kwargs).data
+            return make_etag(request, data), data
+
+        return cached_response(request, self.kwargs['post_pk'], 'comments', build)
+
     def perform_create(self, serializer):
         post = Post.objects.get(pk=self.kwargs['post_pk'])
-        serializer.save(author=self.request.user, post=post)
+        with transaction.atomic():
+            serializer.save(author=self.request.user, post=post)
+            Post.objects.filter(pk=post.pk).update(comments_count=F('comments_count') + 1)
+            record_event('comment', [post.pk])
 
-class UserFeedView(ListAPIView):
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            # A concurrent DELETE of the same comment may have removed the row already
+            deleted, _ = instance.delete()
+            if deleted:
+                Post.objects.filter(pk=instance.post_id).update(comments_count=F('comments_count') - 1)
+
+class UserFeedView(EagerLoadingViewMixin, ListAPIView):
     serializer_class = PostSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    cursor_ordering = ('-created_at', '-post_id')
+    eager_loading_prefix = 'post__'
+    query_budget = 3
 
     def get_queryset(self):
-        followed_users = self.request.user.following.all()
-        queryset = Post.objects.filter(author__in=followed_users).order_by('-created_at')
-        return queryset
+        # Read the precomputed timeline instead of joining every followed author's posts
+        return TimelineEntry.objects.filter(user=self.request.user).select_related('post').order_by('-created_at', '-post_id')
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        entries = page if page is not None else queryset
+        serializer = self.get_serializer([entry.post for entry in entries], many=True)
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
     
+def notify_likes(user, authors):
+    # authors maps each newly liked post id to its author id
+    post_type = ContentType.objects.get_for_model(Post)
+    enqueue([
+        NotificationEvent(recipient_id=author_id, actor=user, verb='liked', content_type=post_type, object_id=post_id)
+        for post_id, author_id in authors.items()
+    ])
+
+class LikeThrottle(BucketThrottle):
+    scope = 'like'
+
+class BulkLikeThrottle(LikeThrottle):
+    def get_cost(self, request, view):
+        # One token per post liked or unliked; runs before the body is validated
+        data = request.data if isinstance(request.data, dict) else {}
+        return max(1, sum(len(ids) for ids in (data.get('like'), data.get('unlike')) if isinstance(ids, list)))
+
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
+@throttle_classes([LikeThrottle])
 def like_post(request, pk):
-    post = get_object_or_404(Post, pk=pk)
-    user = request.user
+    author_id = like(request.user, pk)
+    if author_id is None:
+        return Response({'detail': 'You have already liked this post.'}, status=status.HTTP_200_OK)
 
-    if Like.objects.filter(user=user, post=post).exists():
-        return Response({'detail': 'You have already liked this post.'}, status=status.HTTP_409_CONFLICT)
-    
-    Like.objects.create(user=user, post=post)
-    
-    if user != post.author:
-        Notification.objects.create(
-            recipient=post.author,
-            actor=user,
-            verb='liked',
-            target_object=post
-        )
+    notify_likes(request.user, {pk: author_id})
+    record_event('like', [pk])
     return Response({'detail': 'Post liked successfully.'}, status=status.HTTP_201_CREATED)
 
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
+@throttle_classes([LikeThrottle])
 def unlike_post(request, pk):
-    post = get_object_or_404(Post, pk=pk)
-    user = request.user
-    
-    try:
-        like = Like.objects.get(user=user, post=post)
-        like.delete()
+    if unlike(request.user, pk):
         return Response({'detail': 'Post unliked successfully.'}, status=status.HTTP_200_OK)
-    except Like.DoesNotExist:
-        return Response({'detail': 'You have not liked this post.'}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({'detail': 'You have not liked this post.'}, status=status.HTTP_200_OK)
 
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+@throttle_classes([BulkLikeThrottle])
+def bulk_like_posts(request):
+    serializer = BulkLikeSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+
+    with transaction.atomic():
+        authors = bulk_like(request.user, serializer.validated_data['like'])
+        unliked = bulk_unlike(request.user, serializer.validated_data['unlike'])
+        notify_likes(request.user, authors)
+        record_event('like', authors)
+    return Response({'liked': sorted(authors), 'unliked': sorted(unliked)}, status=status.HTTP_200_OK)
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+@parser_classes([FastJSONParser, NDJSONParser])
+def bulk_create_posts(request):
+    rows = request.data
+    if not isinstance(rows, list):
+        return Response({'detail': 'Expected a JSON array or an NDJSON body.'}, status=status.HTTP_400_BAD_REQUEST)
+    limit = getattr(settings, 'POSTS_IMPORT_MAX_ROWS', 10000)
+    if len(rows) > limit:
+        return Response({'detail': f'At most {limit} posts per request.'}, status=status.HTTP_400_BAD_REQUEST)
 
+    result = import_posts(rows, author=request.user)
+    return Response(result.as_dict(), status=status.HTTP_201_CREATED if result.created else status.HTTP_400_BAD_REQUEST)
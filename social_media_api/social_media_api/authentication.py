@@ -0,0 +1,154 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class TokenCache:
+    """
+    Token key -> (user, token) lookups for CachedTokenAuthentication.
+
+    The first tier is a bounded LRU in this process with a TTL of TOKEN_AUTH_CACHE_TTL
+    seconds; TOKEN_AUTH_SHARED_CACHE optionally names a Django cache alias shared by all
+    processes as the second tier. invalidate() clears both tiers of this process and, with
+    the shared tier, leaves a revocation marker there that every process checks before
+    trusting an entry, so revoked tokens stop working everywhere at once. Without it, other
+    processes' first tier forgets a revoked token at the latest after the TTL.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.hits = self.shared_hits = self.misses = self.evictions = 0
+
+    def _shared(self):
+        alias = _setting('TOKEN_AUTH_SHARED_CACHE', None)
+        return caches[alias] if alias else None
+
+    @staticmethod
+    def _shared_key(key):
+        return f'auth-token:{key}'
+
+    @staticmethod
+    def _revoked_key(key):
+        return f'auth-token-revoked:{key}'
+
+    def get(self, key):
+        now = time.monotonic()
+        shared = self._shared()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] <= now:
+                del self.entries[key]
+                entry = None
+
+        if entry is not None:
+            _, cached_at, value = entry
+            # Wall clock, since the marker may come from another host
+            if shared is None or shared.get(self._revoked_key(key), 0) < cached_at:
+                with self.lock:
+                    if key in self.entries:
+                        self.entries.move_to_end(key)
+                    self.hits += 1
+                return value
+            with self.lock:
+                self.entries.pop(key, None)
+
+        value = None
+        if shared is not None:
+            found = shared.get_many([self._shared_key(key), self._revoked_key(key)])
+            cached_at, value = found.get(self._shared_key(key), (None, None))
+            if value is not None and found.get(self._revoked_key(key), 0) >= cached_at:
+                value = None  # read before the token was revoked
+        with self.lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.shared_hits += 1
+        if value is not None:
+            self._remember(key, cached_at, value)
+        return value
+
+    def set(self, key, value, cached_at=None):
+        """Cache a lookup; `cached_at` is the wall-clock time it was read from the database."""
+        cached_at = time.time() if cached_at is None else cached_at
+        shared = self._shared()
+        if shared is not None:
+            shared.set(self._shared_key(key), (cached_at, value), _setting('TOKEN_AUTH_SHARED_CACHE_TTL', 300))
+        self._remember(key, cached_at, value)
+
+    def _remember(self, key, cached_at, value):
+        expires = time.monotonic() + _setting('TOKEN_AUTH_CACHE_TTL', 10)
+        with self.lock:
+            self.entries[key] = (expires, cached_at, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > _setting('TOKEN_AUTH_CACHE_SIZE', 10000):
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, keys):
+        keys = list(keys)
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+        shared = self._shared()
+        if shared is not None and keys:
+            shared.delete_many([self._shared_key(key) for key in keys])
+            # Outlives every entry cached before now, in either tier
+            timeout = max(_setting('TOKEN_AUTH_CACHE_TTL', 10), _setting('TOKEN_AUTH_SHARED_CACHE_TTL', 300)) + 1
+            shared.set_many({self._revoked_key(key): time.time() for key in keys}, timeout)
+
+    def invalidate_user(self, user_id):
+        with self.lock:
+            keys = [key for key, (_, _, (user, _token)) in self.entries.items() if user.pk == user_id]
+        from rest_framework.authtoken.models import Token
+
+        self.invalidate({*keys, *Token.objects.filter(user_id=user_id).values_list('key', flat=True)})
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                'size': len(self.entries),
+                'max_size': _setting('TOKEN_AUTH_CACHE_SIZE', 10000),
+                'hits': self.hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': (self.hits + self.shared_hits) / lookups if lookups else None,
+            }
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Drop-in TokenAuthentication that skips the Token/User query for recently seen tokens."""
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is None:
+            read_at = time.time()  # before the query, so a revocation racing it still wins
+            cached = super().authenticate_credentials(key)
+            token_cache.set(key, cached, cached_at=read_at)
+
+        user, token = cached
+        if not user.is_active:
+            raise AuthenticationFailed('User inactive or deleted.')
+        # Each request gets its own instances, since views may modify request.user
+        user, token = copy.copy(user), copy.copy(token)
+        token.user = user
+        return user, token
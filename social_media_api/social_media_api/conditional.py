@@ -0,0 +1,35 @@
+import hashlib
+
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+
+def make_etag(request, *parts):
+    """
+    Strong ETag over the values a representation is built from.
+
+    The negotiated format and the query string are part of the tag, since they change
+    the body (browsable API vs JSON, another page of a collection).
+    """
+    renderer = getattr(request, 'accepted_renderer', None)
+    key = repr((getattr(renderer, 'format', None), sorted(request.query_params.lists()), parts))
+    return '"%s"' % hashlib.sha1(key.encode()).hexdigest()
+
+
+def is_not_modified(request, etag):
+    if_none_match = request.headers.get('If-None-Match')
+    if not if_none_match:
+        return False
+    # If-None-Match uses the weak comparison, so a W/ prefix added by a proxy still matches
+    etags = [tag[2:] if tag.startswith('W/') else tag for tag in parse_etags(if_none_match)]
+    return '*' in etags or etag in etags
+
+
+def conditional_response(request, etag, build):
+    """Answer 304 when the client already has `etag`; otherwise call `build()` and tag its response."""
+    if is_not_modified(request, etag):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+    response = build()
+    response['ETag'] = etag
+    return response
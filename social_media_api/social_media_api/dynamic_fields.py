@@ -0,0 +1,62 @@
+from rest_framework.serializers import ListSerializer
+
+_UNSET = object()
+
+
+def parse_spec(value):
+    """
+    Parse a ?fields= or ?expand= value into a tree: "id,author.username" becomes
+    {'id': {}, 'author': {'username': {}}}. Returns None when nothing was given.
+    """
+    if not value:
+        return None
+    tree = {}
+    for path in value.split(','):
+        node = tree
+        for part in filter(None, (part.strip() for part in path.split('.'))):
+            node = node.setdefault(part, {})
+    return tree
+
+
+def child_spec(spec, name):
+    """The part of a ?fields= tree for field `name`; a bare name selects all of its fields."""
+    if spec is None:
+        return None
+    return spec.get(name) or None
+
+
+class DynamicFieldsMixin:
+    """
+    Serializer mixin for sparse fieldsets.
+
+    `field_spec` (from ?fields=) keeps only the named fields, recursively for nested
+    serializers; None keeps them all. `expand_spec` (from ?expand=) swaps the fields listed
+    in `expandable_fields`, e.g. a primary key, for the nested serializer built by their
+    factory. Both are passed by EagerLoadingViewMixin, which shapes the queryset to match.
+    """
+    expandable_fields = {}
+
+    def __init__(self, *args, **kwargs):
+        self.field_spec = kwargs.pop('field_spec', None)
+        self.expand_spec = kwargs.pop('expand_spec', None) or {}
+        super().__init__(*args, **kwargs)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        for name in self.expand_spec:
+            if name in self.expandable_fields:
+                fields[name] = self.expandable_fields[name]()
+        if self.field_spec is not None:
+            fields = {name: field for name, field in fields.items() if name in self.field_spec}
+
+        # Hand each nested serializer its part of the spec before it builds its own fields
+        for name, field in fields.items():
+            child = field.child if isinstance(field, ListSerializer) else field
+            if isinstance(child, DynamicFieldsMixin):
+                child.field_spec = child_spec(self.field_spec, name)
+                child.expand_spec = self.expand_spec.get(name, {})
+        return fields
+
+    def nested_kwargs(self, name):
+        """Spec kwargs for a serializer built by hand for field `name`, e.g. in a SerializerMethodField."""
+        return {'field_spec': child_spec(self.field_spec, name), 'expand_spec': self.expand_spec.get(name, {})}
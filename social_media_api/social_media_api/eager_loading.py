@@ -0,0 +1,163 @@
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework.serializers import ListSerializer
+
+from .dynamic_fields import DynamicFieldsMixin, child_spec, parse_spec
+
+
+class EagerLoadingMixin:
+    """
+    Serializer mixin that declares which related rows a representation needs.
+
+    Nested serializers are discovered from the declared fields (an FK becomes a
+    `select_related`, anything under a `many=True` serializer becomes a `prefetch_related`),
+    and extra relations that are rendered without a nested serializer, such as a list of
+    primary keys, are listed in `prefetch_related_fields`. Fields computed in Python list
+    the columns they read in `field_dependencies`, so sparse fieldsets can use `only()`.
+    """
+    select_related_fields = ()
+    prefetch_related_fields = ()
+    field_dependencies = {}
+
+    @classmethod
+    def _rendered_fields(cls, fields=None, expand=None):
+        # (name, field) pairs of the declared fields a request renders, expanded ones included
+        declared = dict(cls._declared_fields)
+        for name in expand or {}:
+            if name in getattr(cls, 'expandable_fields', {}):
+                declared[name] = cls.expandable_fields[name]()
+        names = getattr(cls.Meta, 'fields', declared) if fields is None else fields
+        return [(name, declared.get(name)) for name in names]
+
+    @classmethod
+    def get_related_paths(cls, prefix='', many=False, fields=None, expand=None):
+        select, prefetch = [], []
+        if fields is None:
+            for path in cls.select_related_fields:
+                (prefetch if many else select).append(prefix + path)
+            for path in cls.prefetch_related_fields:
+                prefetch.append(prefix + path)
+
+        for name, field in cls._rendered_fields(fields, expand):
+            for dependency in cls.field_dependencies.get(name, ()):
+                if '__' in dependency:
+                    (prefetch if many else select).append(prefix + dependency.rsplit('__', 1)[0])
+            nested_many = isinstance(field, ListSerializer)
+            child = field.child if nested_many else field
+            if not isinstance(child, EagerLoadingMixin):
+                continue
+            source = field.source or name
+            if source == '*':
+                path = prefix.rstrip('_')
+            else:
+                path = prefix + source.replace('.', '__')
+                (prefetch if many or nested_many else select).append(path)
+            nested_select, nested_prefetch = child.get_related_paths(
+                path + '__' if path else '', many or nested_many,
+                child_spec(fields, name), (expand or {}).get(name))
+            select += nested_select
+            prefetch += nested_prefetch
+        return select, prefetch
+
+    @classmethod
+    def get_only_paths(cls, prefix='', fields=None, expand=None):
+        """
+        Columns to load for a sparse fieldset, as `only()` paths, or None when some rendered
+        field cannot be traced to columns and everything has to be loaded.
+        """
+        if fields is None and (cls.select_related_fields or cls.prefetch_related_fields):
+            return None
+        model = cls.Meta.model
+        paths = []
+        for name, field in cls._rendered_fields(fields, expand):
+            nested_many = isinstance(field, ListSerializer)
+            child = field.child if nested_many else field
+            if name in cls.field_dependencies:
+                paths += [prefix + path for path in cls.field_dependencies[name]]
+            elif nested_many:
+                continue  # prefetched separately
+            elif isinstance(child, EagerLoadingMixin):
+                path = prefix + (field.source or name).replace('.', '__')
+                nested = child.get_only_paths(path + '__', child_spec(fields, name), (expand or {}).get(name))
+                if nested is None:
+                    return None
+                paths += [path, *nested]
+            else:
+                source = getattr(field, 'source', None) or name
+                try:
+                    model_field = model._meta.get_field(source)
+                except FieldDoesNotExist:
+                    if field is None:
+                        continue  # unknown name in ?fields=, not rendered either
+                    return None
+                if not model_field.concrete or model_field.many_to_many:
+                    return None
+                paths.append(prefix + source)
+        return paths
+
+    @classmethod
+    def setup_eager_loading(cls, queryset, prefix='', fields=None, expand=None):
+        select, prefetch = cls.get_related_paths(prefix, fields=fields, expand=expand)
+        if select:
+            queryset = queryset.select_related(*select)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        return queryset
+
+
+class EagerLoadingViewMixin:
+    """
+    Generic view mixin that applies the serializer's related-data needs to the queryset.
+
+    `eager_loading_prefix` is used when the view's queryset is not the serialized model
+    itself, e.g. timeline rows whose `post` is what gets rendered.
+
+    Clients can ask for a sparse fieldset with ?fields=id,author.username and for
+    expandable relations with ?expand=post; list queries then select only the related
+    rows and, where every field maps to columns, only the columns that are rendered.
+    """
+    eager_loading_prefix = ''
+
+    def get_field_specs(self):
+        params = self.request.query_params
+        return parse_spec(params.get('fields')), parse_spec(params.get('expand')) or {}
+
+    def get_serializer(self, *args, **kwargs):
+        if issubclass(self.get_serializer_class(), DynamicFieldsMixin):
+            field_spec, expand_spec = self.get_field_specs()
+            kwargs.setdefault('field_spec', field_spec)
+            kwargs.setdefault('expand_spec', expand_spec)
+        return super().get_serializer(*args, **kwargs)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        serializer_class = self.get_serializer_class()
+        if not issubclass(serializer_class, EagerLoadingMixin):
+            return queryset
+
+        fields, expand = self.get_field_specs()
+        prefix = self.eager_loading_prefix
+        queryset = serializer_class.setup_eager_loading(queryset, prefix=prefix, fields=fields, expand=expand)
+        # Detail views keep whole rows: they are cached, versioned and saved as a whole
+        detail = (self.lookup_url_kwarg or self.lookup_field) in self.kwargs
+        if fields is not None and not detail:
+            only = serializer_class.get_only_paths(prefix, fields, expand)
+            if only is not None:
+                queryset = queryset.only(*only, *self._row_fields(queryset, prefix))
+        return queryset
+
+    def _row_fields(self, queryset, prefix):
+        # Columns the view itself needs besides the rendered ones: the paginator's ordering,
+        # or every column of the wrapping row when the rendered object is a relation of it
+        model = queryset.model
+        if prefix:
+            return [prefix[:-2], *(field.name for field in model._meta.concrete_fields)]
+        ordering = getattr(self, 'cursor_ordering', None) or getattr(self.paginator, 'ordering', None) or ()
+        names = []
+        for name in ordering:
+            name = name.lstrip('-')
+            try:
+                if model._meta.get_field(name).concrete:
+                    names.append(name)
+            except FieldDoesNotExist:
+                pass
+        return names
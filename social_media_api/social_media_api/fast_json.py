@@ -0,0 +1,62 @@
+"""
+JSON renderer and parser backed by orjson when it is installed.
+
+Without orjson (or for output it cannot produce byte-for-byte like DRF, such as
+indented or ASCII-only JSON) they behave exactly like DRF's JSONRenderer/JSONParser.
+"""
+import decimal
+
+from django.conf import settings
+from django.utils.functional import Promise
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+
+def _default(obj, encoder=JSONRenderer.encoder_class()):
+    # Called by orjson only for types it has no native support for
+    if isinstance(obj, Promise):
+        return str(obj)  # lazy translation strings
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)  # as DRF's encoder; DecimalField output is already a string
+    return encoder.default(obj)
+
+
+def dumps(data):
+    # Native datetimes/UUIDs/dataclasses; non-string dict keys are coerced like the json module does
+    return orjson.dumps(data, default=_default, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or self.ensure_ascii:
+            return super().render(data, accepted_media_type, renderer_context)
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = dumps(data)
+        # Same JavaScript-safe escaping of U+2028/U+2029 as JSONRenderer
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+class FastJSONParser(JSONParser):
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        # orjson reads UTF-8 only and always rejects NaN/Infinity, i.e. strict mode
+        if orjson is None or encoding.lower().replace('-', '') != 'utf8' or not self.strict:
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
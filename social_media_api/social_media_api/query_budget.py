@@ -0,0 +1,158 @@
+"""
+Per-request SQL accounting: how many queries a request ran, how long they took and which
+statements ran more than once (the usual sign of an N+1).
+
+Views declare what they may spend with `query_budget`, either one number or a mapping
+of viewset action (or lower-case HTTP method, for plain views) to a number:
+
+    class PostViewSet(...):
+        query_budget = {'list': 4, 'retrieve': 3}
+
+QueryBudgetMiddleware measures every request, logs it and adds debug headers; the
+`query_budget()` context manager makes tests fail when a request goes over its budget.
+"""
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('social_media_api.queries')
+
+_IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+_watchers = threading.local()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def signature(sql):
+    """The shape of a statement: parameters are placeholders already, IN lists of any length collapse."""
+    return _IN_LIST.sub('IN (...)', sql)
+
+
+class QueryStats:
+    def __init__(self):
+        self.count = 0
+        self.time = 0.0
+        self.signatures = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        # Installed with connection.execute_wrapper()
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.time += time.perf_counter() - started
+            self.count += 1
+            self.signatures[signature(sql)] += 1
+
+    @property
+    def duplicates(self):
+        return {sql: count for sql, count in self.signatures.items() if count > 1}
+
+
+@contextmanager
+def recording(stats):
+    """Count every query run on any database connection of this thread into `stats`."""
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(stats))
+        yield stats
+
+
+def get_budget(view_func, request):
+    """The query budget the view behind `view_func` declares for this request, or None."""
+    budget = getattr(getattr(view_func, 'cls', None), 'query_budget', None)
+    if isinstance(budget, dict):
+        method = request.method.lower()
+        actions = getattr(view_func, 'actions', None) or {}
+        budget = budget.get(actions.get(method, method))
+    return budget
+
+
+def view_name(view_func, request):
+    cls = getattr(view_func, 'cls', None)
+    if cls is None:
+        return getattr(view_func, '__name__', '')
+    actions = getattr(view_func, 'actions', None) or {}
+    return f'{cls.__name__}.{actions.get(request.method.lower(), request.method.lower())}'
+
+
+class QueryBudgetMiddleware:
+    """
+    Measures the SQL each request runs. Every request is logged on the
+    'social_media_api.queries' logger as key=value pairs (also in the record's `query_stats`,
+    with repeated statements in `duplicate_queries`), at WARNING when it exceeds its view's
+    budget. QUERY_BUDGET_HEADERS adds X-Query-Count, X-Query-Time (ms) and X-Query-Duplicates.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = QueryStats()
+        with recording(stats):
+            response = self.get_response(request)
+
+        view, budget = getattr(request, '_query_budget_view', ('', None))
+        over_budget = budget is not None and stats.count > budget
+        duplicates = stats.duplicates
+        fields = {
+            'method': request.method, 'path': request.path, 'status': response.status_code, 'view': view,
+            'queries': stats.count, 'sql_ms': round(stats.time * 1000, 2), 'budget': budget,
+            'duplicates': sum(duplicates.values()) - len(duplicates),
+        }
+        logger.log(logging.WARNING if over_budget else logging.INFO,
+                   ' '.join(f'{key}={value}' for key, value in fields.items()),
+                   extra={'query_stats': fields, 'duplicate_queries': duplicates})
+
+        if _setting('QUERY_BUDGET_HEADERS', settings.DEBUG):
+            response['X-Query-Count'] = str(stats.count)
+            response['X-Query-Time'] = f'{stats.time * 1000:.2f}'
+            response['X-Query-Duplicates'] = str(fields['duplicates'])
+        if over_budget:
+            for violations in getattr(_watchers, 'stack', ()):
+                violations.append((fields, duplicates))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._query_budget_view = (view_name(view_func, request), get_budget(view_func, request))
+
+
+@contextmanager
+def query_budget(max_queries=None, allow_duplicates=True):
+    """
+    Test helper. Records the SQL run inside the block and fails with AssertionError when a
+    request served inside it went over its view's `query_budget`, when the block ran more
+    than `max_queries` queries in total, or, unless `allow_duplicates`, when one statement
+    ran more than once.
+
+        with query_budget():
+            self.client.get(reverse('user_feed'))
+    """
+    stats = QueryStats()
+    violations = []
+    stack = _watchers.__dict__.setdefault('stack', [])
+    stack.append(violations)
+    try:
+        with recording(stats):
+            yield stats
+    finally:
+        stack.remove(violations)
+
+    problems = [f'{fields["view"] or fields["path"]} ran {fields["queries"]} queries, budget {fields["budget"]}'
+                + ''.join(f'\n    {count}x {sql}' for sql, count in duplicates.items())
+                for fields, duplicates in violations]
+    if max_queries is not None and stats.count > max_queries:
+        problems.append(f'{stats.count} queries ran, expected at most {max_queries}')
+    if not allow_duplicates and stats.duplicates:
+        problems.append('repeated queries:' + ''.join(f'\n    {count}x {sql}'
+                                                      for sql, count in stats.duplicates.items()))
+    if problems:
+        raise AssertionError('Query budget exceeded:\n  ' + '\n  '.join(problems))
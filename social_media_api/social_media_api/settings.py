@@ -61,6 +61,7 @@ AUTH_USER_MODEL = 'accounts.User'
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'social_media_api.query_budget.QueryBudgetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -70,13 +71,116 @@ MIDDLEWARE = [
 ]
 
 REST_FRAMEWORK = {
-    'DEFAULT_AUTHENTICATION_CLASSES': ['rest_framework.authentication.TokenAuthentication',], 
+    'DEFAULT_AUTHENTICATION_CLASSES': ['social_media_api.authentication.CachedTokenAuthentication',],
+    # orjson-backed when installed (social_media_api/fast_json.py), stdlib json otherwise
+    'DEFAULT_RENDERER_CLASSES': [
+        'social_media_api.fast_json.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'social_media_api.fast_json.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_PERMISSION_CLASSES': ['rest_framework.permissions.IsAuthenticated',],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
     'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
+    # Token buckets per user (per IP when anonymous) of social_media_api.throttling.BucketThrottle
+    'DEFAULT_THROTTLE_RATES': {
+        'like': '120/min',
+        'follow': '30/min',
+        'login': '10/min',
+    },
+    # Anonymous clients are throttled by IP. X-Forwarded-For is client-controlled except for the
+    # entries our own proxies append, so only trust that many: the Heroku router adds one
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', 1)),
+}
+
+# Where BucketThrottle keeps its buckets: None for this process only, or a cache alias
+# shared by every worker (point it at Redis/Memcached when running several)
+THROTTLE_CACHE = None
+THROTTLE_MAX_KEYS = 100000
+
+# Token lookups cached by CachedTokenAuthentication (social_media_api/authentication.py):
+# per-process LRU size and TTL in seconds, plus an optional shared cache alias as second tier.
+# Without the shared tier, other workers accept a revoked token for up to the TTL
+TOKEN_AUTH_CACHE_SIZE = 10000
+TOKEN_AUTH_CACHE_TTL = 10
+TOKEN_AUTH_SHARED_CACHE = None
+TOKEN_AUTH_SHARED_CACHE_TTL = 300
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
 }
 
+# Cached following/follower id sets (accounts/graph.py); point FOLLOW_GRAPH_CACHE at a
+# shared cache alias when running several processes
+FOLLOW_GRAPH_CACHE = 'default'
+FOLLOW_GRAPH_CACHE_TIMEOUT = 3600
+
+# "People you may know" (accounts/suggestions.py): list length, users per process-pool
+# chunk and worker processes (None uses every CPU)
+SUGGESTIONS_SIZE = 20
+SUGGESTIONS_CHUNK_SIZE = 1000
+SUGGESTIONS_WORKERS = None
+
+# Cached post detail / comment list responses (posts/response_cache.py): cache alias,
+# entry lifetime and how long concurrent readers wait for the one rebuilding an entry.
+# Off by default; the alias must be shared by every worker (Redis, Memcached), since a
+# per-process cache never sees other workers' invalidations (system check posts.E001)
+POSTS_RESPONSE_CACHE = None
+POSTS_RESPONSE_CACHE_TIMEOUT = 300
+POSTS_RESPONSE_CACHE_LOCK_TIMEOUT = 5
+
+# Trending posts (posts/trending.py): scores halve every TRENDING_HALF_LIFE seconds; the
+# compact_trending job drops scores under TRENDING_MIN_SCORE and ranks the top TRENDING_SIZE
+# in posts_trendingscore.rank, which every web process reads
+TRENDING_HALF_LIFE = 6 * 3600
+TRENDING_WEIGHTS = {'like': 1.0, 'comment': 2.0}
+TRENDING_SIZE = 50
+TRENDING_MIN_SCORE = 0.05
+TRENDING_COMPACT_INTERVAL = 300
+
+# Bulk post import (posts/bulk_import.py): rows validated and inserted per transaction,
+# and the most rows POST /api/posts/bulk/ accepts in one request
+POSTS_IMPORT_BATCH_SIZE = 1000
+POSTS_IMPORT_MAX_ROWS = 10000
+
+# Per-request SQL accounting (social_media_api/query_budget.py): debug headers with the
+# query count, SQL time and repeated statements; views declare limits as `query_budget`
+QUERY_BUDGET_HEADERS = DEBUG
+
+# Materialized home timelines (posts/timeline.py)
+TIMELINE_BACKFILL_SIZE = 200
+TIMELINE_BATCH_SIZE = 1000
+
+# Full-text search for posts (posts/search.py): 'auto' picks MySQL FULLTEXT, SQLite FTS5
+# or the built-in inverted index; a dotted path selects a backend explicitly
+POSTS_SEARCH_BACKEND = 'auto'
+POSTS_SEARCH_MAX_RESULTS = 1000
+
+# Notification delivery (notifications/dispatch.py): 'outbox' queues events for the
+# process_notifications worker, 'sync' writes notifications inside the request
+NOTIFICATIONS_DISPATCH_MODE = 'outbox'
+NOTIFICATIONS_BATCH_SIZE = 500
+NOTIFICATIONS_MAX_ATTEMPTS = 5
+NOTIFICATIONS_RETRY_DELAY = 30
+# Same recipient + verb + target within this many seconds are merged into one notification (0 disables)
+NOTIFICATIONS_COALESCE_WINDOW = 3600
+NOTIFICATIONS_SAMPLE_ACTORS = 3
+
+# Server-sent events stream (notifications/streaming.py). PollingBroker serves notifications
+# written by other processes; InProcessBroker is enough when they are delivered in-process.
+NOTIFICATIONS_STREAM_BROKER = 'notifications.streaming.PollingBroker'
+NOTIFICATIONS_STREAM_HEARTBEAT = 15
+NOTIFICATIONS_STREAM_POLL_INTERVAL = 1.0
+# Seconds a ticket from POST /api/notifications/stream-ticket/ can be used to open the stream
+NOTIFICATIONS_STREAM_TICKET_TTL = 60
+
 ROOT_URLCONF = 'social_media_api.urls'
 
 TEMPLATES = [
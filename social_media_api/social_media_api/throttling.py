@@ -0,0 +1,120 @@
+import math
+import threading
+import time
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+@lru_cache(maxsize=None)
+def parse_rate(rate):
+    """'30/min' -> (30, 60.0): bucket capacity and the seconds it takes to refill completely."""
+    num, period = rate.split('/')
+    return int(num), float(PERIODS[period[0]])
+
+
+class LocalBuckets:
+    """
+    Buckets kept in this process. Each key stores one number, the time at which its bucket
+    would be full again (the GCRA form of a token bucket), so a full bucket needs no entry
+    and expired keys can be dropped without changing behaviour.
+    """
+
+    def __init__(self):
+        self.refilled_at = {}
+        self.lock = threading.Lock()
+
+    def take(self, key, capacity, period, cost=1):
+        """Take `cost` tokens; returns 0 when allowed, else the seconds until they are available."""
+        now = time.monotonic()
+        interval = period / capacity * min(cost, capacity)
+        with self.lock:
+            refilled_at = max(self.refilled_at.get(key, now), now)
+            wait = refilled_at + interval - now - period
+            if wait > 0:
+                return wait
+            self.refilled_at[key] = refilled_at + interval
+            if len(self.refilled_at) > _setting('THROTTLE_MAX_KEYS', 100000):
+                self.refilled_at = {k: t for k, t in self.refilled_at.items() if t > now}
+        return 0
+
+    def clear(self):
+        with self.lock:
+            self.refilled_at.clear()
+
+
+class CacheBuckets:
+    """
+    The same buckets in a Django cache shared by every worker. Reads and writes are not
+    atomic, so concurrent requests for one key may let a few extra through.
+    """
+
+    def __init__(self, alias):
+        self.cache = caches[alias]
+
+    def take(self, key, capacity, period, cost=1):
+        now = time.time()  # wall clock, since workers on several hosts share the entries
+        interval = period / capacity * min(cost, capacity)
+        key = f'throttle:{key}'
+        refilled_at = max(self.cache.get(key, now), now)
+        wait = refilled_at + interval - now - period
+        if wait > 0:
+            return wait
+        self.cache.set(key, refilled_at + interval, math.ceil(refilled_at + interval - now))
+        return 0
+
+    def clear(self):
+        pass  # entries expire once their bucket is full
+
+
+local_buckets = LocalBuckets()
+
+
+def get_buckets():
+    # THROTTLE_CACHE names a shared cache alias for multi-worker deployments
+    alias = _setting('THROTTLE_CACHE', None)
+    return local_buckets if alias is None else CacheBuckets(alias)
+
+
+class BucketThrottle(BaseThrottle):
+    """
+    Token-bucket throttle per authenticated user, or per client IP for anonymous requests.
+
+    The rate comes from REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'][scope], e.g. '30/min': a
+    burst of up to 30 requests, refilled at one every two seconds. `scope` is set on a
+    subclass or as `throttle_scope` on the view; a rate of None disables the throttle.
+    A request takes `get_cost()` tokens, at most a full bucket. Refused requests get 429
+    with Retry-After.
+    """
+    scope = None
+
+    def get_cost(self, request, view):
+        return 1
+
+    def allow_request(self, request, view):
+        scope = getattr(view, 'throttle_scope', None) or self.scope
+        try:
+            rate = api_settings.DEFAULT_THROTTLE_RATES[scope]
+        except KeyError:
+            raise ImproperlyConfigured(f'No throttle rate set for scope {scope!r}.')
+        if rate is None:
+            return True
+
+        user = request.user
+        ident = f'user:{user.pk}' if user and user.is_authenticated else f'ip:{self.get_ident(request)}'
+        self.wait_seconds = get_buckets().take(f'{scope}:{ident}', *parse_rate(rate),
+                                               cost=self.get_cost(request, view))
+        return not self.wait_seconds
+
+    def wait(self):
+        return self.wait_seconds